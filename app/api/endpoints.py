@@ -1,16 +1,96 @@
 # app/api/endpoints.py
-from fastapi import APIRouter, Depends, HTTPException
-from pydantic import BaseModel
-from services.rag_search import RagSearch
-from services.rag_question import RagQuestion
-from services.qdrant_update import QdrantUpdater
-from llama_index.embeddings.openai import OpenAIEmbedding
-from llama_index.llms.openai import OpenAI
+import logging
+import threading
+from collections import OrderedDict
+from typing import List, Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 
 from config import settings
 
+# The services pull in llama_index, OpenAI, Cohere and Qdrant, which together take several
+# seconds to import. They are imported inside the dependency functions below so the app
+# starts (and --reload cycles) without paying that cost, and each service is built once
+# and shared between requests.
+#
+# Services are built per tenant. The most recently used TENANT_CACHE_SIZE tenants keep
+# their services (and whatever they have warmed up) in memory; the least recently used
+# tenant is dropped when another one arrives, so memory stays bounded however many
+# tenants one deployment serves. The Qdrant client itself is shared by all tenants.
 router = APIRouter()
 
+_services = OrderedDict()
+_services_lock = threading.Lock()
+# Per-tenant build locks, dropped together with the tenant's services on eviction
+_build_locks = {}
+_rate_limiter = None
+_job_runner = None
+
+def _get_or_create_service(name, tenant, factory):
+    with _services_lock:
+        service = _services.get(tenant, {}).get(name)
+        if service is not None:
+            _services.move_to_end(tenant)
+            return service
+        build_lock = _build_locks.setdefault(tenant, {}).setdefault(name, threading.Lock())
+
+    # Build outside the global lock so one tenant's cold start (opening its Qdrant, OpenAI
+    # and Cohere clients) doesn't block other tenants. The per-service lock keeps
+    # concurrent requests for the same tenant from building it twice.
+    with build_lock:
+        with _services_lock:
+            service = _services.get(tenant, {}).get(name)
+        if service is None:
+            service = factory(tenant)
+
+        with _services_lock:
+            _services.setdefault(tenant, {}).setdefault(name, service)
+            _services.move_to_end(tenant)
+            while len(_services) > max(settings.TENANT_CACHE_SIZE, 1):
+                evicted, _ = _services.popitem(last=False)
+                _build_locks.pop(evicted, None)
+                logging.info(f"Evicted services for tenant '{evicted}'")
+        return service
+
+def resolve_request_tenant(x_tenant_id: Optional[str] = Header(None)) -> str:
+    """
+    Resolve the request's tenant from the X-Tenant-ID header, without rate limiting.
+
+    Raises:
+        HTTPException: 404 for an unknown tenant.
+    """
+    from services.tenancy import resolve_tenant
+
+    try:
+        return resolve_tenant(settings, x_tenant_id)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+def get_rate_limiter():
+    """
+    Return the per-tenant rate limiter shared by API requests and background jobs.
+    """
+    global _rate_limiter
+    from services.tenancy import TenantRateLimiter
+
+    with _services_lock:
+        if _rate_limiter is None:
+            _rate_limiter = TenantRateLimiter(settings)
+        return _rate_limiter
+
+def get_tenant(tenant: str = Depends(resolve_request_tenant)) -> str:
+    """
+    Resolve the request's tenant and apply its rate limit.
+
+    Raises:
+        HTTPException: 404 for an unknown tenant, 429 when the tenant is over its limit.
+    """
+    if not get_rate_limiter().allow(tenant):
+        raise HTTPException(status_code=429, detail=f"Rate limit exceeded for tenant '{tenant}'")
+    return tenant
+
 class UpdateRequest(BaseModel):
     node_id: str
     answer: str
@@ -19,23 +99,110 @@ class QueryRequest(BaseModel):
     query: str
     product: str = "all"
 
-def get_rag_search_service():
-    return RagSearch()
+class QuestionnaireJobRequest(BaseModel):
+    rows: List[QueryRequest] = Field(..., min_length=1, max_length=settings.JOB_MAX_ROWS)
+
+class ReindexJobRequest(BaseModel):
+    suggest: bool = False
+
+def _create_rag_search_service(tenant):
+    from services.rag_search import RagSearch
+    return RagSearch(tenant=tenant)
+
+def _create_rag_question_service(tenant):
+    from llama_index.embeddings.openai import OpenAIEmbedding
+    from llama_index.llms.openai import OpenAI
+    from services.rag_question import RagQuestion
 
-def get_rag_question_service():
     llm = OpenAI(model=settings.OPENAI_LLM_MODEL, temperature=settings.TEMPERATURE, api_key=settings.OPENAI_API_KEY)
-    return RagQuestion(llm=llm, embed_model=OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY))
+    return RagQuestion(llm=llm, embed_model=OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY), tenant=tenant)
+
+def _create_qdrant_updater_service(tenant):
+    from services.qdrant_update import QdrantUpdater
+    return QdrantUpdater(tenant=tenant)
+
+def _create_qdrant_exporter_service(tenant):
+    from services.qdrant_export import QdrantExporter
+    return QdrantExporter(tenant=tenant)
+
+def get_rag_search_service(tenant: str = Depends(get_tenant)):
+    return _get_or_create_service("rag_search", tenant, _create_rag_search_service)
+
+def get_rag_question_service(tenant: str = Depends(get_tenant)):
+    return _get_or_create_service("rag_question", tenant, _create_rag_question_service)
+
+def get_qdrant_updater_service(tenant: str = Depends(get_tenant)):
+    return _get_or_create_service("qdrant_updater", tenant, _create_qdrant_updater_service)
+
+def get_qdrant_exporter_service(tenant: str = Depends(get_tenant)):
+    return _get_or_create_service("qdrant_exporter", tenant, _create_qdrant_exporter_service)
+
+def _create_questionnaire_job_handler(job_id, tenant, params):
+    from services.job_handlers import QuestionnaireJobHandler
+    return QuestionnaireJobHandler(rag_search=_get_or_create_service("rag_search", tenant, _create_rag_search_service),
+                                   rate_limiter=get_rate_limiter(),
+                                   tenant=tenant)
 
-def get_qdrant_updater_service():
-    return QdrantUpdater()
+def _create_reindex_job_handler(job_id, tenant, params):
+    from services.job_handlers import ReindexJobHandler
+    return ReindexJobHandler(tenant=tenant, qa_directory=params["qa_directory"], suggest=params.get("suggest", False))
+
+def get_job_runner():
+    """
+    Return the background job runner, creating its SQLite queue on first use.
+    """
+    global _job_runner
+    from services.jobs import JobRunner, JobStore
+
+    with _services_lock:
+        if _job_runner is None:
+            _job_runner = JobRunner(
+                store=JobStore(settings.JOBS_DB_PATH),
+                handlers={
+                    "questionnaire": _create_questionnaire_job_handler,
+                    "reindex": _create_reindex_job_handler,
+                },
+                workers=settings.JOB_WORKERS
+            )
+        return _job_runner
+
+def start_job_workers():
+    """
+    Start the job workers, resuming jobs interrupted by the previous shutdown.
+    """
+    if settings.JOB_WORKERS > 0:
+        get_job_runner().start()
+
+def stop_job_workers():
+    """
+    Stop the job workers after their current row.
+    """
+    if _job_runner is not None:
+        _job_runner.stop()
+
+def warm_up_services():
+    """
+    Import and build every service, then open its upstream connections with a dummy query.
+
+    Meant to run in a background thread at startup so the first real request finds the
+    modules imported and the Qdrant/OpenAI/Cohere connections already established.
+    Only the default tenant is warmed up; other tenants are built on their first request.
+    Failures are logged and never prevent the app from serving.
+    """
+    for get_service in (get_rag_search_service, get_rag_question_service, get_qdrant_updater_service, get_qdrant_exporter_service):
+        try:
+            get_service(settings.DEFAULT_TENANT).warm_up()
+        except Exception as e:
+            logging.warning(f"Warm-up failed in {get_service.__name__}: {str(e)}")
+    logging.info("Service warm-up complete")
 
 @router.post("/query")
-async def query_rag(request: QueryRequest, rag_search_service: RagSearch = Depends(get_rag_search_service)):
+async def query_rag(request: QueryRequest, rag_search_service=Depends(get_rag_search_service)):
     result = rag_search_service.query_rag(request.query, request.product)
     return result
 
 @router.post("/ask")
-async def ask_question(request: QueryRequest, rag_question_service: RagQuestion = Depends(get_rag_question_service)):
+async def ask_question(request: QueryRequest, rag_question_service=Depends(get_rag_question_service)):
     try:
         result = rag_question_service.query(request.query)
         return result
@@ -49,7 +216,7 @@ async def ask_question(request: QueryRequest, rag_question_service: RagQuestion
         )
 
 @router.post("/update")
-async def update_document(update_data: UpdateRequest, qdrant_updater_service: QdrantUpdater = Depends(get_qdrant_updater_service)):
+async def update_document(update_data: UpdateRequest, qdrant_updater_service=Depends(get_qdrant_updater_service)):
     print(f"Endpoint -> update_document -> node_id: {update_data.node_id}")
     try:
         result = qdrant_updater_service.update_document(
@@ -60,4 +227,107 @@ async def update_document(update_data: UpdateRequest, qdrant_updater_service: Qd
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/documents")
+def list_documents(
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    document_name: Optional[str] = None,
+    product: Optional[str] = None,
+    fields: Optional[List[str]] = Query(None),
+    with_vectors: bool = False,
+    qdrant_exporter_service=Depends(get_qdrant_exporter_service)
+):
+    try:
+        return qdrant_exporter_service.list_documents(
+            limit=limit,
+            cursor=cursor,
+            document_name=document_name,
+            product=product,
+            fields=fields,
+            with_vectors=with_vectors
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/export")
+def export_documents(
+    format: Literal["ndjson", "json"] = "ndjson",
+    document_name: Optional[str] = None,
+    product: Optional[str] = None,
+    with_vectors: bool = False,
+    qdrant_exporter_service=Depends(get_qdrant_exporter_service)
+):
+    if format == "json":
+        content = qdrant_exporter_service.export_json(document_name=document_name, product=product, with_vectors=with_vectors)
+        media_type = "application/json"
+    else:
+        content = qdrant_exporter_service.export_ndjson(document_name=document_name, product=product, with_vectors=with_vectors)
+        media_type = "application/x-ndjson"
+    return StreamingResponse(content, media_type=media_type)
+
+@router.get("/stats/suggestions")
+def suggestion_stats():
+    from services.structured_output import suggestion_parse_stats
+    return suggestion_parse_stats.snapshot()
+
+# Long-running work (answering a whole questionnaire, reindexing a tenant's QA files) is
+# submitted as a job and processed by the job workers, one row at a time with a checkpoint
+# per row. Poll /jobs/{job_id} for progress and /jobs/{job_id}/rows for results.
+
+def _submit_job(job_type: str, tenant: str, params: dict, items: List[dict]):
+    from services.jobs import JobQuotaExceeded
+
+    try:
+        return get_job_runner().submit(job_type, tenant, params, items, max_active=settings.JOB_MAX_ACTIVE_PER_TENANT)
+    except JobQuotaExceeded as e:
+        raise HTTPException(status_code=429, detail=str(e))
+
+def _get_tenant_job(job_id: str, tenant: str):
+    job = get_job_runner().store.get(job_id)
+    if job is None or job.tenant != tenant:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+@router.post("/jobs/questionnaire", status_code=202)
+def submit_questionnaire_job(request: QuestionnaireJobRequest, tenant: str = Depends(get_tenant)):
+    return _submit_job("questionnaire", tenant, {}, [row.model_dump() for row in request.rows])
+
+@router.post("/jobs/reindex", status_code=202)
+def submit_reindex_job(request: ReindexJobRequest, tenant: str = Depends(get_tenant)):
+    from services.qa_documents import list_qa_files
+    from services.tenancy import tenant_qa_directory
+
+    qa_directory = tenant_qa_directory(settings, tenant)
+    files = list_qa_files(qa_directory)
+    if not files:
+        raise HTTPException(status_code=404, detail=f"No QA files found for tenant '{tenant}'")
+    params = {"qa_directory": qa_directory, "suggest": request.suggest}
+    return _submit_job("reindex", tenant, params, [{"file": filename} for filename in files])
+
+@router.get("/jobs")
+def list_jobs(limit: int = Query(50, ge=1, le=500), tenant: str = Depends(resolve_request_tenant)):
+    return get_job_runner().store.list(tenant, limit=limit)
+
+# Polling is not rate limited, so watching a job never uses up the tenant's /query budget
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str, tenant: str = Depends(resolve_request_tenant)):
+    return _get_tenant_job(job_id, tenant)
+
+@router.get("/jobs/{job_id}/rows")
+def get_job_rows(
+    job_id: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    tenant: str = Depends(resolve_request_tenant)
+):
+    _get_tenant_job(job_id, tenant)
+    return get_job_runner().store.rows(job_id, offset=offset, limit=limit)
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str, tenant: str = Depends(resolve_request_tenant)):
+    _get_tenant_job(job_id, tenant)
+    if not get_job_runner().store.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"Job {job_id} has already finished")
+    return get_job_runner().store.get(job_id)
@@ -1,13 +1,27 @@
 # app/config.py
-from typing import Optional
+import re
+from typing import Any, Dict, Optional
+from pydantic import field_validator
 from pydantic_settings import BaseSettings
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Tenant ids end up in collection names, so keep them to a safe character set
+TENANT_ID_PATTERN = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+# <alias>_v<digits> names are blue/green versions of <alias> (see collection_aliases.py).
+# A tenant id that is or ends in v<digits> would make its collection look like a version
+# of the default tenant's or another tenant's collection (e.g. "acme_v20260101" next to
+# "acme"), which pruning could then delete.
+RESERVED_TENANT_PATTERN = re.compile(r"(^|_)v\d+$")
+
 class Settings(BaseSettings):
     QDRANT_SERVER: Optional[str] = "localhost"
     QDRANT_PORT: Optional[int] = 6333
+    QDRANT_GRPC_PORT: Optional[int] = 6334
+    # "http" (REST), "grpc" (remote server over gRPC) or "local" (embedded, stored at QDRANT_STORAGE_PATH)
+    QDRANT_MODE: str = "http"
     QDRANT_VECTOR_COLLECTION: Optional[str] = "questions_and_answers_rag_vector"
     QDRANT_STORAGE_PATH: Optional[str] = "/app/storage/qdrant"
     
@@ -19,11 +33,91 @@ class Settings(BaseSettings):
     
     COHERE_API_KEY: Optional[str] = None
     
+    # /query retrieval: one group per question cluster, then MMR before reranking
+    QUERY_GROUP_BY: str = "cluster_id"
+    QUERY_GROUP_SIZE: int = 1
+    QUERY_CANDIDATE_GROUPS: int = 10
+    QUERY_MMR_TOP_K: int = 5
+    QUERY_MMR_LAMBDA: float = 0.7
+    QUERY_SIMILARITY_CUTOFF: float = 0.45
+    QUERY_RERANK_TOP_N: int = 3
+    
+    # /ask retrieval
+    ASK_SIMILARITY_TOP_K: int = 25
+    ASK_SIMILARITY_CUTOFF: float = 0.45
+    ASK_RERANK_TOP_N: int = 7
+    
+    # ragbuilder node splitting
+    CHUNK_SIZE: int = 2048
+    CHUNK_OVERLAP: int = 256
+    
+    # Serve the suggested answer precomputed by ragbuilder --suggest when the top reranked
+    # hit scores at least this much, instead of calling the LLM
+    SUGGESTION_REUSE_ENABLED: bool = True
+    SUGGESTION_REUSE_MIN_SCORE: float = 0.9
+    
     COMPANY_NAME: Optional[str] = "ACME Corp"
     
+    # Multi-tenancy. Requests pick a tenant with the X-Tenant-ID header (DEFAULT_TENANT if absent).
+    # TENANT_MODE "collection" gives each tenant its own <QDRANT_VECTOR_COLLECTION>_<tenant>
+    # collection; "payload" keeps all tenants in QDRANT_VECTOR_COLLECTION, partitioned by a
+    # tenant_id payload index.
+    TENANT_MODE: str = "collection"
+    DEFAULT_TENANT: str = "default"
+    # Other tenants as JSON, with optional overrides, e.g.
+    # {"globex": {"company_name": "Globex", "rate_limit_per_minute": 30}}
+    TENANTS: Dict[str, Dict[str, Any]] = {}
+    # Requests per minute per tenant on the API (0, the default, disables the limit)
+    TENANT_RATE_LIMIT_PER_MINUTE: int = 0
+    # Tenants whose services (clients, indexes, warmed caches) are kept in memory at once
+    TENANT_CACHE_SIZE: int = 8
+    
+    # Build services and open Qdrant/OpenAI/Cohere connections in the background at startup
+    WARMUP_ON_STARTUP: bool = True
+    
     # Storage paths
     QA_DIRECTORY_PATH: Optional[str] = "/app/data/questions_and_answers"
+    CONVERSION_CACHE_PATH: Optional[str] = "/app/data/conversion_cache"
+    
+    # Background jobs (/jobs): SQLite queue location and number of jobs run at once
+    # (0 leaves submitted jobs queued without running them)
+    JOBS_DB_PATH: str = "/app/data/jobs/jobs.db"
+    JOB_WORKERS: int = 1
+    # Largest questionnaire accepted per job, and queued or running jobs allowed per tenant
+    JOB_MAX_ROWS: int = 2000
+    JOB_MAX_ACTIVE_PER_TENANT: int = 3
     
+    @staticmethod
+    def normalize_tenant_id(tenant: str) -> str:
+        """
+        Lowercase a tenant id and check that it is safe to use in collection names.
+
+        Raises:
+            ValueError: If the tenant id is malformed or reserved.
+        """
+        tenant = tenant.strip().lower()
+        if not TENANT_ID_PATTERN.match(tenant) or RESERVED_TENANT_PATTERN.search(tenant):
+            raise ValueError(f"Invalid tenant id '{tenant}'")
+        return tenant
+
+    # Configured tenant ids are normalized like the X-Tenant-ID header, and an invalid one
+    # fails at startup instead of making every request for that tenant return 404
+    @field_validator("DEFAULT_TENANT")
+    @classmethod
+    def _validate_default_tenant(cls, value: str) -> str:
+        return cls.normalize_tenant_id(value)
+
+    @field_validator("TENANTS")
+    @classmethod
+    def _validate_tenants(cls, value: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        tenants = {}
+        for tenant, overrides in value.items():
+            normalized = cls.normalize_tenant_id(tenant)
+            if normalized in tenants:
+                raise ValueError(f"Tenant '{normalized}' is configured more than once")
+            tenants[normalized] = overrides
+        return tenants
+
     model_config = {
         "env_file": ".env",
         "env_file_encoding": "utf-8",
@@ -1,9 +1,23 @@
 # app/main.py
+import threading
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from api import endpoints
+from config import settings
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background so startup isn't blocked on imports and network round trips
+    if settings.WARMUP_ON_STARTUP:
+        threading.Thread(target=endpoints.warm_up_services, name="service-warm-up", daemon=True).start()
+    # Background job workers, resuming jobs interrupted by the last shutdown
+    endpoints.start_job_workers()
+    yield
+    endpoints.stop_job_workers()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -1,9 +1,11 @@
 # app/prompt.py
-qa_prompt_tmpl_str = (
-    "Context information is below.\n"
-    "---------------------\n"
-    "{context_str}\n"
-    "---------------------\n"
+from llama_index.core import ChatPromptTemplate
+from llama_index.core.llms import ChatMessage, MessageRole
+
+# The suggestion prompt is split into a static system prefix and a short per-request
+# suffix. Everything that never changes comes first, so providers that cache prompt
+# prefixes (e.g. OpenAI prompt caching) can reuse it across requests.
+qa_system_prompt_str = (
     "You are an expert in improving the quality and clarity of written responses. Your task is to enhance the given answer to the question while maintaining its core meaning and accuracy. Follow these guidelines:\n\n"
     
     "1. If the original answer is simply 'yes' or 'none', provide it as the answer, BUT also include a 'Suggested Improvement Answer' that elaborates on the affirmative response without using 'Yes'.\n"
@@ -24,8 +26,8 @@ qa_prompt_tmpl_str = (
     "      - If unsure about an acronym's meaning, leave it as is.\n"
     "   k. You may add transitional phrases or connective language to improve flow, as long as they don't alter the meaning.\n"
     "   l. If specific quantities or timeframes are mentioned, keep them exactly as stated.\n"
-    "   m. Use ACME Corp instead of 'The company' (or similar) in any answers that are generated.\n"
-    "   n. Capatalize ACME Corp anytime it is used."
+    "   m. Use {company_name} instead of 'The company' (or similar) in any answers that are generated.\n"
+    "   n. Capatalize {company_name} anytime it is used.\n\n"
     
     "Your goal is to refine and clarify the existing content while staying true to the original response. Enhance readability and professionalism, but avoid introducing new facts or making assumptions beyond reasonable inferences from the given information.\n\n"
     
@@ -34,14 +36,41 @@ qa_prompt_tmpl_str = (
     "**Provide your response in the following JSON format:**\n\n"
     "{\n"
     "  \"suggested_answer\": \"[Your suggested improvement here, or 'No suggested improvement' if no improvement is needed]\"\n"
-    "}\n\n"
-    
+    "}\n"
+)
+
+qa_user_prompt_tmpl_str = (
+    "Context information is below.\n"
+    "---------------------\n"
+    "{context_str}\n"
+    "---------------------\n"
     "Improve the following answer to the given question:\n\n"
     
     "Question: {query_str}\n"
     "Answer: \n"
 )
 
+# Single-string form of the suggestion prompt, static prefix first
+qa_prompt_tmpl_str = qa_system_prompt_str + "\n" + qa_user_prompt_tmpl_str
+
+def with_company_name(template: str, company_name: str) -> str:
+    """
+    Fill in the tenant's company name, leaving the per-request variables in place.
+    """
+    return template.replace("{company_name}", company_name)
+
+def qa_chat_prompt(company_name: str) -> ChatPromptTemplate:
+    """
+    Build the suggestion prompt as chat messages, as /query and the precomputed suggestions send it.
+
+    The static instructions are the system message and the per-request context/question
+    come last, so the prefix can be served from the provider's prompt cache.
+    """
+    return ChatPromptTemplate(message_templates=[
+        ChatMessage(role=MessageRole.SYSTEM, content=with_company_name(qa_system_prompt_str, company_name)),
+        ChatMessage(role=MessageRole.USER, content=qa_user_prompt_tmpl_str),
+    ])
+
 general_qa_prompt_tmpl_str = """You are an AI assistant specializing in vendor questionnaires and security documentation. Your task is to generate a clear and concise answer to the question below, using only the information provided in the context. If the context does not contain enough information to answer the question confidently, acknowledge this limitation.
 
 Context:
@@ -0,0 +1,192 @@
+# app/services/grouped_retriever.py
+import logging
+from typing import List, Optional
+
+import numpy as np
+from qdrant_client import QdrantClient, models
+
+from llama_index.core import QueryBundle
+from llama_index.core.retrievers import BaseRetriever
+from llama_index.core.schema import NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from .suggested_answers import SUGGESTION_PAYLOAD_KEYS
+
+def mmr_select(query_vector: np.ndarray,
+               vectors: np.ndarray,
+               top_k: int,
+               lambda_mult: float,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Select a diverse subset of candidates with Maximal Marginal Relevance.
+
+    Each step picks the candidate that maximizes
+    lambda * sim(query, candidate) - (1 - lambda) * max sim(candidate, already selected).
+
+    Args:
+        query_vector (np.ndarray): The query embedding.
+        vectors (np.ndarray): Candidate embeddings, one per row.
+        top_k (int): Number of candidates to select.
+        lambda_mult (float): Trade-off between relevance (1.0) and diversity (0.0).
+        relevance (Optional[np.ndarray]): Precomputed query similarities (e.g. the search
+                                          scores); computed from the vectors when None.
+
+    Returns:
+        List[int]: Indexes of the selected candidates, in selection order.
+    """
+    if len(vectors) == 0:
+        return []
+
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query_vector = query_vector / max(np.linalg.norm(query_vector), 1e-12)
+
+    if relevance is None:
+        relevance = vectors @ query_vector
+    pairwise = vectors @ vectors.T
+
+    selected = [int(np.argmax(relevance))]
+    redundancy = pairwise[selected[0]].copy()
+    while len(selected) < min(top_k, len(vectors)):
+        scores = lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        scores[selected] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        redundancy = np.maximum(redundancy, pairwise[best])
+    return selected
+
+def _dense_vector(vector) -> List[float]:
+    # Collections with named vectors return a {name: vector} mapping
+    if isinstance(vector, dict):
+        return next(iter(vector.values()))
+    return vector
+
+class GroupedQdrantRetriever(BaseRetriever):
+    """
+    Retrieves one result group per question cluster and diversifies the candidates with MMR.
+
+    Qdrant's grouped search collapses copies of the same question (same group key) so
+    the retrieval limit is spent on distinct questions. MMR then removes remaining
+    near-duplicates before the candidates reach the reranker and the LLM. When fewer
+    groups than the limit come back, the best points without the group key (rows added
+    before the key existed, or a collection built without it) are merged in, so they
+    are never left out.
+
+    Search results carry payloads only. Vectors are fetched afterwards for the candidates
+    MMR compares, and only when there are more candidates than MMR keeps.
+
+    Attributes:
+        client (QdrantClient): Client for interacting with the Qdrant vector database.
+        collection_name (str): Name of the vector collection being searched.
+        embed_model: Embedding model used when the query bundle carries no embedding.
+        group_by (str): Payload key identifying a question cluster.
+        group_size (int): Hits kept per group as MMR candidates.
+        limit (int): Number of groups retrieved.
+        mmr_top_k (int): Number of candidates passed on after MMR.
+        mmr_lambda (float): MMR relevance/diversity trade-off.
+        query_filter (Optional[models.Filter]): Filter applied to the search.
+    """
+
+    def __init__(self,
+                 client: QdrantClient,
+                 collection_name: str,
+                 embed_model=None,
+                 group_by: str = "cluster_id",
+                 group_size: int = 1,
+                 limit: int = 10,
+                 mmr_top_k: int = 5,
+                 mmr_lambda: float = 0.7,
+                 query_filter: Optional[models.Filter] = None):
+        super().__init__()
+        self.client = client
+        self.collection_name = collection_name
+        self.embed_model = embed_model
+        self.group_by = group_by
+        self.group_size = group_size
+        self.limit = limit
+        self.mmr_top_k = mmr_top_k
+        self.mmr_lambda = mmr_lambda
+        self.query_filter = query_filter
+
+    def _search(self, embedding: List[float]) -> List[models.ScoredPoint]:
+        """
+        Run the grouped search, merging in ungrouped points when groups are sparse.
+        """
+        result = self.client.query_points_groups(
+            collection_name=self.collection_name,
+            query=embedding,
+            group_by=self.group_by,
+            limit=self.limit,
+            group_size=self.group_size,
+            query_filter=self.query_filter,
+            with_payload=True,
+            with_vectors=False
+        )
+        hits = [hit for group in result.groups for hit in group.hits]
+        if len(result.groups) >= self.limit:
+            return hits
+
+        # Points without the group key never form a group; each one counts as its own
+        ungrouped_filter = models.Filter(must=[
+            models.IsEmptyCondition(is_empty=models.PayloadField(key=self.group_by)),
+            *([self.query_filter] if self.query_filter else [])
+        ])
+        ungrouped = self.client.query_points(
+            collection_name=self.collection_name,
+            query=embedding,
+            limit=self.limit - len(result.groups),
+            query_filter=ungrouped_filter,
+            with_payload=True,
+            with_vectors=False
+        ).points
+        if ungrouped:
+            logging.info(f"Merged {len(ungrouped)} points without '{self.group_by}' into {len(result.groups)} groups")
+        return sorted(hits + ungrouped, key=lambda hit: hit.score, reverse=True)
+
+    def _select(self, embedding: List[float], hits: List[models.ScoredPoint]) -> List[int]:
+        """
+        Pick the MMR candidates, fetching vectors only when MMR has something to drop.
+        """
+        if len(hits) <= self.mmr_top_k:
+            return list(range(len(hits)))
+
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=[hit.id for hit in hits],
+            with_payload=False,
+            with_vectors=True
+        )
+        vectors = {record.id: _dense_vector(record.vector) for record in records}
+        return mmr_select(
+            np.asarray(embedding, dtype=np.float32),
+            np.asarray([vectors[hit.id] for hit in hits], dtype=np.float32),
+            top_k=self.mmr_top_k,
+            lambda_mult=self.mmr_lambda,
+            relevance=np.asarray([hit.score for hit in hits], dtype=np.float32)
+        )
+
+    def _retrieve(self, query_bundle: QueryBundle) -> List[NodeWithScore]:
+        if query_bundle.embedding is None:
+            query_bundle.embedding = self.embed_model.get_text_embedding(query_bundle.query_str)
+
+        hits = self._search(query_bundle.embedding)
+        if not hits:
+            return []
+
+        selected = self._select(query_bundle.embedding, hits)
+        logging.info(f"GroupedQdrantRetriever -> {len(hits)} grouped hits, {len(selected)} after MMR")
+
+        nodes = []
+        for index in selected:
+            hit = hits[index]
+            node = metadata_dict_to_node(hit.payload)
+            node.id_ = str(hit.id)
+
+            # Carry precomputed suggestions over from the top-level payload, keeping them
+            # out of the LLM context
+            for key in SUGGESTION_PAYLOAD_KEYS:
+                if key in hit.payload:
+                    node.metadata[key] = hit.payload[key]
+                    node.excluded_llm_metadata_keys.append(key)
+                    node.excluded_embed_metadata_keys.append(key)
+            nodes.append(NodeWithScore(node=node, score=hit.score))
+        return nodes
@@ -0,0 +1,153 @@
+# app/services/job_handlers.py
+import os
+import logging
+from typing import Any, Dict, Optional
+
+from qdrant_client import models
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.storage.storage_context import StorageContext
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.llms.openai import OpenAI
+from llama_index.vector_stores.qdrant import QdrantVectorStore
+
+from config import settings
+from prompt import qa_chat_prompt
+from services.jobs import JobHandler
+from services.qa_documents import (
+    delete_stale_document_points,
+    ensure_document_index,
+    previous_document_payloads,
+    qa_documents,
+    read_qa_file,
+    restore_document_payloads,
+)
+from services.qdrant_connection import get_qdrant_client
+from services.rag_search import RagSearch
+from services.suggested_answers import SuggestedAnswerGenerator
+from services.tenancy import (
+    TenantRateLimiter,
+    ensure_tenant_index,
+    tenant_collection,
+    tenant_company_name,
+    tenant_conditions,
+    tenant_payload,
+)
+
+class QuestionnaireJobHandler(JobHandler):
+    """
+    Answers a questionnaire one row at a time through the /query pipeline.
+
+    Each row is a {"query": ..., "product": ...} request and its result is the same
+    QueryResponse /query returns. Every row takes a token from the tenant's rate limiter,
+    so a job runs no faster than the tenant's request budget allows.
+
+    Attributes:
+        rag_search (RagSearch): The tenant's search service.
+        rate_limiter (TenantRateLimiter): Limiter shared with the API.
+        tenant (str): Tenant the job runs for.
+        stats (Dict[str, int]): How many suggestions were precomputed or generated live.
+    """
+
+    def __init__(self, rag_search: RagSearch, rate_limiter: TenantRateLimiter, tenant: str):
+        self.rag_search = rag_search
+        self.rate_limiter = rate_limiter
+        self.tenant = tenant
+        self.stats = {"precomputed": 0, "llm": 0}
+
+    def process(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        self.rate_limiter.wait(self.tenant)
+        response = self.rag_search.query_rag(item["query"], item.get("product", "all"))
+        self.stats[response.suggestion_source] = self.stats.get(response.suggestion_source, 0) + 1
+        return response.model_dump()
+
+    def finish(self) -> Dict[str, Any]:
+        # Counts cover the last run only when the job was resumed after a restart
+        return {"suggestion_sources": self.stats}
+
+class ReindexJobHandler(JobHandler):
+    """
+    Re-ingests a tenant's QA JSON files, one file per row.
+
+    Each file's rows are written first, then the points previously stored for the same
+    document are deleted, so queries never see the document missing and a file that is
+    processed twice (after a restart) still ends up stored once. Unchanged questions keep
+    their dedupe.py --mark cluster and precomputed suggestion. Other documents and other
+    tenants are not touched. Optionally precomputes suggested answers at the end.
+
+    Attributes:
+        tenant (str): Tenant being reindexed.
+        qa_directory (str): Directory holding the tenant's QA JSON files.
+        suggest (bool): Whether to precompute suggested answers after the last file.
+        collection_name (str): Collection (or alias) written to.
+    """
+
+    def __init__(self, tenant: str, qa_directory: str, suggest: bool = False):
+        self.tenant = tenant
+        self.qa_directory = qa_directory
+        self.suggest = suggest
+        self.collection_name = tenant_collection(settings, tenant)
+
+        self.client = get_qdrant_client(settings)
+        self.embed_model = OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+        self.vector_store = QdrantVectorStore(collection_name=self.collection_name, client=self.client, enable_hybrid=False)
+        self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
+        self.text_splitter = SentenceSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+        self.rows = 0
+
+    def process(self, item: Dict[str, Any]) -> Dict[str, Any]:
+        # Only file names are queued, so the job can't read outside the tenant's directory
+        data = read_qa_file(os.path.join(self.qa_directory, os.path.basename(item["file"])))
+        if data is None:
+            raise ValueError(f"Could not read {item['file']}")
+
+        document_name = data.get("document_name", "")
+        conditions = tenant_conditions(settings, self.tenant)
+        previous = previous_document_payloads(self.client, self.collection_name, document_name, conditions)
+
+        documents = qa_documents([data], tenant_metadata=tenant_payload(settings, self.tenant))
+        nodes = self.text_splitter.get_nodes_from_documents(documents)
+        restored = 0
+        if nodes:
+            VectorStoreIndex(nodes=nodes, embed_model=self.embed_model, storage_context=self.storage_context)
+            restored = restore_document_payloads(self.client, self.collection_name, nodes, previous)
+
+        # Drop the document's previous points, keeping the ones just written
+        if self.client.collection_exists(self.collection_name):
+            delete_stale_document_points(self.client, self.collection_name, document_name,
+                                         keep_ids=[node.node_id for node in nodes],
+                                         conditions=conditions)
+
+        self.rows += len(nodes)
+        return {"document_name": document_name, "rows": len(nodes), "restored": restored}
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        if not self.client.collection_exists(self.collection_name):
+            return {"rows": self.rows}
+
+        # Same payload indexes ragbuilder creates
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="cluster_id",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+        ensure_document_index(self.client, self.collection_name)
+        if tenant_payload(settings, self.tenant):
+            ensure_tenant_index(self.client, self.collection_name)
+
+        # Rows written by this run; a resumed job doesn't count the files done before the restart
+        summary = {"rows": self.rows}
+        if self.suggest:
+            conditions = tenant_conditions(settings, self.tenant)
+            generator = SuggestedAnswerGenerator(
+                client=self.client,
+                collection_name=self.collection_name,
+                llm=OpenAI(model=settings.OPENAI_LLM_MODEL, temperature=settings.TEMPERATURE, api_key=settings.OPENAI_API_KEY),
+                model=settings.OPENAI_LLM_MODEL,
+                prompt=qa_chat_prompt(tenant_company_name(settings, self.tenant)),
+                scroll_filter=models.Filter(must=conditions) if conditions else None
+            )
+            summary["suggested_answers"] = generator.run()
+            logging.info(f"Reindex of tenant '{self.tenant}' suggested answers: {summary['suggested_answers']}")
+        return summary
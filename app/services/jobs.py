@@ -0,0 +1,459 @@
+# app/services/jobs.py
+import os
+import json
+import time
+import uuid
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+# Job states. A running job whose process stops stays "running" in the database and is
+# queued again when the next JobRunner starts.
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATES = (COMPLETED, FAILED, CANCELLED)
+ACTIVE_STATES = (QUEUED, RUNNING)
+
+class JobQuotaExceeded(Exception):
+    """
+    Raised when a tenant submits a job while it already has its maximum of active jobs.
+    """
+
+class JobInfo(BaseModel):
+    """
+    Progress report for a background job.
+
+    Attributes:
+        id (str): Job id.
+        type (str): Job type, e.g. "questionnaire" or "reindex".
+        tenant (str): Tenant the job belongs to.
+        status (str): queued, running, completed, failed or cancelled.
+        total (int): Number of rows in the job.
+        completed (int): Rows processed successfully.
+        failed (int): Rows that raised an error.
+        progress (float): Fraction of rows processed, 0 to 1.
+        eta_seconds (Optional[float]): Estimated time left, from the rate since the job (re)started.
+        created_at (datetime): When the job was submitted.
+        started_at (Optional[datetime]): When a worker first picked the job up.
+        finished_at (Optional[datetime]): When the job completed, failed or was cancelled.
+        error (Optional[str]): Why the job failed.
+        summary (Optional[Dict[str, Any]]): Job-specific totals reported when it completes.
+    """
+    id: str
+    type: str
+    tenant: str
+    status: str
+    total: int
+    completed: int
+    failed: int
+    progress: float
+    eta_seconds: Optional[float] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    error: Optional[str] = None
+    summary: Optional[Dict[str, Any]] = None
+
+class JobRow(BaseModel):
+    """
+    Outcome of one row of a job.
+
+    Attributes:
+        index (int): Position of the row in the job.
+        status (str): pending, completed or failed.
+        result (Optional[Dict[str, Any]]): What the handler returned for the row.
+        error (Optional[str]): Why the row failed.
+    """
+    index: int
+    status: str
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, tz=timezone.utc) if value is not None else None
+
+class JobStore:
+    """
+    SQLite-backed job queue with per-row checkpoints.
+
+    A job is a list of rows. Each processed row is committed with its result, so an
+    interrupted job resumes from its first unprocessed row and the results of finished
+    rows are never recomputed. The database runs in WAL mode so progress polling doesn't
+    block the workers.
+
+    Attributes:
+        path (str): Path of the SQLite database file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    tenant TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    total INTEGER NOT NULL,
+                    completed INTEGER NOT NULL DEFAULT 0,
+                    failed INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    run_started_at REAL,
+                    run_start_done INTEGER NOT NULL DEFAULT 0,
+                    finished_at REAL,
+                    error TEXT,
+                    summary TEXT
+                );
+                CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at);
+                CREATE INDEX IF NOT EXISTS jobs_tenant ON jobs (tenant, created_at);
+                CREATE TABLE IF NOT EXISTS job_rows (
+                    job_id TEXT NOT NULL,
+                    row_index INTEGER NOT NULL,
+                    item TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    result TEXT,
+                    error TEXT,
+                    PRIMARY KEY (job_id, row_index)
+                );
+            """)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation keeps the store safe to share between threads
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.row_factory = sqlite3.Row
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _to_info(row: sqlite3.Row) -> JobInfo:
+        done = row["completed"] + row["failed"]
+        eta_seconds = None
+        if row["status"] in FINISHED_STATES:
+            eta_seconds = 0.0
+        elif row["status"] == RUNNING and row["run_started_at"] is not None:
+            done_this_run = done - row["run_start_done"]
+            elapsed = time.time() - row["run_started_at"]
+            if done_this_run > 0 and elapsed > 0:
+                eta_seconds = (row["total"] - done) * elapsed / done_this_run
+
+        return JobInfo(
+            id=row["id"],
+            type=row["type"],
+            tenant=row["tenant"],
+            status=row["status"],
+            total=row["total"],
+            completed=row["completed"],
+            failed=row["failed"],
+            progress=done / row["total"] if row["total"] else 1.0,
+            eta_seconds=eta_seconds,
+            created_at=_timestamp(row["created_at"]),
+            started_at=_timestamp(row["started_at"]),
+            finished_at=_timestamp(row["finished_at"]),
+            error=row["error"],
+            summary=json.loads(row["summary"]) if row["summary"] else None
+        )
+
+    def create(self,
+               job_type: str,
+               tenant: str,
+               params: Dict[str, Any],
+               items: List[Dict[str, Any]],
+               max_active: Optional[int] = None) -> JobInfo:
+        """
+        Queue a new job.
+
+        Args:
+            job_type (str): Job type, selects the handler.
+            tenant (str): Tenant the job runs for.
+            params (Dict[str, Any]): Job-wide parameters passed to the handler.
+            items (List[Dict[str, Any]]): The rows to process, in order.
+            max_active (Optional[int]): Most queued or running jobs the tenant may have,
+                                        including this one. Unlimited when None.
+
+        Returns:
+            JobInfo: The queued job.
+
+        Raises:
+            JobQuotaExceeded: If the tenant already has max_active active jobs.
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as connection:
+            # The count and the insert share one write transaction, so concurrent submissions
+            # can't both pass the quota check
+            connection.execute("BEGIN IMMEDIATE")
+            if max_active is not None and self._active_count(connection, tenant) >= max_active:
+                raise JobQuotaExceeded(f"Tenant '{tenant}' already has {max_active} queued or running job(s)")
+            connection.execute(
+                "INSERT INTO jobs (id, type, tenant, status, params, total, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, job_type, tenant, QUEUED, json.dumps(params), len(items), time.time())
+            )
+            connection.executemany(
+                "INSERT INTO job_rows (job_id, row_index, item) VALUES (?, ?, ?)",
+                ((job_id, index, json.dumps(item)) for index, item in enumerate(items))
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_info(row) if row else None
+
+    def params(self, job_id: str) -> Dict[str, Any]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT params FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row["params"]) if row else {}
+
+    @staticmethod
+    def _active_count(connection: sqlite3.Connection, tenant: str) -> int:
+        return connection.execute(
+            "SELECT COUNT(*) AS active FROM jobs WHERE tenant = ? AND status IN (?, ?)", (tenant, *ACTIVE_STATES)
+        ).fetchone()["active"]
+
+    def active_count(self, tenant: str) -> int:
+        """
+        Return how many of a tenant's jobs are queued or running.
+        """
+        with self._connect() as connection:
+            return self._active_count(connection, tenant)
+
+    def list(self, tenant: str, limit: int = 50) -> List[JobInfo]:
+        """
+        Return a tenant's most recent jobs, newest first.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT * FROM jobs WHERE tenant = ? ORDER BY created_at DESC LIMIT ?", (tenant, limit)
+            ).fetchall()
+        return [self._to_info(row) for row in rows]
+
+    def rows(self, job_id: str, offset: int = 0, limit: int = 100) -> List[JobRow]:
+        """
+        Return a page of a job's rows with their results.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT row_index, status, result, error FROM job_rows WHERE job_id = ? "
+                "ORDER BY row_index LIMIT ? OFFSET ?", (job_id, limit, offset)
+            ).fetchall()
+        return [
+            JobRow(index=row["row_index"], status=row["status"],
+                   result=json.loads(row["result"]) if row["result"] else None, error=row["error"])
+            for row in rows
+        ]
+
+    def pending_rows(self, job_id: str) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Return the rows not processed yet, in order.
+        """
+        with self._connect() as connection:
+            rows = connection.execute(
+                "SELECT row_index, item FROM job_rows WHERE job_id = ? AND status = 'pending' ORDER BY row_index",
+                (job_id,)
+            ).fetchall()
+        return [(row["row_index"], json.loads(row["item"])) for row in rows]
+
+    def claim_next(self) -> Optional[str]:
+        """
+        Atomically move the oldest queued job to running.
+
+        Returns:
+            Optional[str]: The claimed job id, or None if nothing is queued.
+        """
+        with self._connect() as connection:
+            # BEGIN IMMEDIATE takes the write lock up front, so two workers never claim the same job
+            connection.execute("BEGIN IMMEDIATE")
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            connection.execute(
+                "UPDATE jobs SET status = ?, started_at = COALESCE(started_at, ?), run_started_at = ?, "
+                "run_start_done = completed + failed WHERE id = ?",
+                (RUNNING, now, now, row["id"])
+            )
+            return row["id"]
+
+    def checkpoint(self, job_id: str, index: int, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None):
+        """
+        Record the outcome of one row and update the job's counters in the same transaction.
+        """
+        status = "failed" if error is not None else "completed"
+        with self._connect() as connection:
+            updated = connection.execute(
+                "UPDATE job_rows SET status = ?, result = ?, error = ? WHERE job_id = ? AND row_index = ? AND status = 'pending'",
+                (status, json.dumps(result) if result is not None else None, error, job_id, index)
+            ).rowcount
+            if updated:
+                connection.execute(f"UPDATE jobs SET {status} = {status} + 1 WHERE id = ?", (job_id,))
+
+    def status(self, job_id: str) -> Optional[str]:
+        with self._connect() as connection:
+            row = connection.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row["status"] if row else None
+
+    def finish(self, job_id: str, status: str, error: Optional[str] = None, summary: Optional[Dict[str, Any]] = None):
+        """
+        Mark a running job completed or failed. A job cancelled meanwhile stays cancelled.
+        """
+        with self._connect() as connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ?, summary = ? WHERE id = ? AND status = ?",
+                (status, time.time(), error, json.dumps(summary) if summary is not None else None, job_id, RUNNING)
+            )
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a queued or running job. A running job stops after its current row.
+
+        Returns:
+            bool: False if the job had already finished.
+        """
+        with self._connect() as connection:
+            updated = connection.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, time.time(), job_id, QUEUED, RUNNING)
+            ).rowcount
+        return bool(updated)
+
+    def requeue_interrupted(self) -> int:
+        """
+        Queue jobs left running by a previous process so they resume from their checkpoints.
+
+        Returns:
+            int: Number of jobs queued again.
+        """
+        with self._connect() as connection:
+            return connection.execute("UPDATE jobs SET status = ? WHERE status = ?", (QUEUED, RUNNING)).rowcount
+
+class JobHandler(ABC):
+    """
+    Processes the rows of one job.
+
+    Handlers are built per job run by the factory registered for the job type. `process`
+    is called once per unprocessed row and its return value is stored as the row's result;
+    an exception fails only that row. `finish` runs after the last row and its return
+    value is stored as the job summary.
+    """
+
+    @abstractmethod
+    def process(self, item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        pass
+
+    def finish(self) -> Optional[Dict[str, Any]]:
+        return None
+
+class JobRunner:
+    """
+    Worker pool executing queued jobs in background threads.
+
+    The workers are separate from the threads serving HTTP requests, so at most
+    `workers` jobs run at a time however many are queued, and interactive requests keep
+    their own capacity. Each worker processes its job's rows one after another.
+
+    Attributes:
+        store (JobStore): The persistent queue.
+        handlers (Dict[str, Callable]): Job type to handler factory, called with
+                                        (job_id, tenant, params).
+        workers (int): Number of jobs processed concurrently.
+    """
+
+    def __init__(self,
+                 store: JobStore,
+                 handlers: Dict[str, Callable[[str, str, Dict[str, Any]], JobHandler]],
+                 workers: int = 1,
+                 poll_interval: float = 5.0):
+        self.store = store
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._wake = threading.Event()
+        self._stopping = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        """
+        Resume interrupted jobs and start the workers.
+        """
+        resumed = self.store.requeue_interrupted()
+        if resumed:
+            logging.info(f"Resuming {resumed} interrupted job(s)")
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        """
+        Ask the workers to stop after their current row. Unfinished jobs resume on the next start.
+        """
+        self._stopping.set()
+        self._wake.set()
+
+    def submit(self,
+               job_type: str,
+               tenant: str,
+               params: Dict[str, Any],
+               items: List[Dict[str, Any]],
+               max_active: Optional[int] = None) -> JobInfo:
+        """
+        Queue a job and wake an idle worker.
+
+        Raises:
+            ValueError: If no handler is registered for the job type.
+            JobQuotaExceeded: If the tenant already has max_active queued or running jobs.
+        """
+        if job_type not in self.handlers:
+            raise ValueError(f"Unknown job type '{job_type}'")
+        job = self.store.create(job_type, tenant, params, items, max_active=max_active)
+        self._wake.set()
+        return job
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job_id = self.store.claim_next()
+            if job_id is None:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+                continue
+            self._run(job_id)
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        try:
+            handler = self.handlers[job.type](job.id, job.tenant, self.store.params(job.id))
+            for index, item in self.store.pending_rows(job.id):
+                if self._stopping.is_set() or self.store.status(job.id) != RUNNING:
+                    return
+                try:
+                    self.store.checkpoint(job.id, index, result=handler.process(item))
+                except Exception as e:
+                    logging.error(f"Job {job.id} row {index} failed: {str(e)}")
+                    self.store.checkpoint(job.id, index, error=str(e))
+            if self._stopping.is_set():
+                return
+            self.store.finish(job.id, COMPLETED, summary=handler.finish())
+            logging.info(f"Job {job.id} ({job.type}) finished")
+        except Exception as e:
+            logging.error(f"Job {job.id} ({job.type}) failed: {str(e)}")
+            self.store.finish(job.id, FAILED, error=str(e))
@@ -0,0 +1,224 @@
+# app/services/qa_documents.py
+import os
+import json
+import hashlib
+from typing import Any, Dict, List, Optional
+
+from qdrant_client import QdrantClient, models
+from llama_index.core import Document
+from llama_index.core.schema import BaseNode
+
+from .suggested_answers import SUGGESTION_PAYLOAD_KEYS
+from .tenancy import TENANT_PAYLOAD_KEY
+
+# Payload written after ingestion (dedupe.py --mark clusters, precomputed suggestions) that
+# is carried over when a document is re-ingested. Suggestions stay safe to carry because
+# their hash no longer matches if the question or answer changed.
+CARRIED_PAYLOAD_KEYS = ("cluster_id", "is_duplicate") + SUGGESTION_PAYLOAD_KEYS
+
+# Loading QA JSON files into Documents is shared by ragbuilder (which imports this module
+# as app.services.qa_documents) and the API's reindex job (services.qa_documents).
+
+def question_key(question: str) -> str:
+    """
+    Builds a cluster key from the normalized question text.
+
+    Identical questions across documents share the key, so /query can group them.
+    dedupe.py --mark later replaces it with a semantic cluster id.
+
+    Args:
+        question (str): The question text
+
+    Returns:
+        str: SHA-1 of the lowercased, whitespace-collapsed question
+    """
+    normalized = " ".join(question.lower().split()).rstrip("?. ")
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+def read_qa_file(file_path: str) -> Optional[Dict[str, Any]]:
+    """
+    Loads one question-answer JSON file.
+
+    Args:
+        file_path (str): Path to the QA JSON file
+
+    Returns:
+        Optional[Dict[str, Any]]: The file's {"document_name": ..., "data": [...]} object,
+                                  or None if it can't be read
+    """
+    try:
+        with open(file_path, 'r') as f:
+            return json.load(f)
+    except json.JSONDecodeError:
+        print(f"Error decoding JSON from file: {os.path.basename(file_path)}")
+    except IOError:
+        print(f"Error reading file: {os.path.basename(file_path)}")
+    return None
+
+def list_qa_files(qa_directory: str) -> List[str]:
+    """
+    Lists the QA JSON files in a directory, sorted by name.
+    """
+    try:
+        return sorted(filename for filename in os.listdir(qa_directory) if filename.endswith('.json'))
+    except FileNotFoundError as e:
+        print(f"{e}")
+        return []
+
+def read_qa_directory(qa_directory: str) -> List[Dict[str, Any]]:
+    """
+    Loads question-answer pairs from JSON files in the specified directory.
+
+    Args:
+        qa_directory (str): Path to the directory containing QA JSON files
+
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries containing the loaded QA pairs
+    """
+    all_data = []
+    for filename in list_qa_files(qa_directory):
+        data = read_qa_file(os.path.join(qa_directory, filename))
+        if data is not None:
+            all_data.append(data)
+    return all_data
+
+def qa_documents(text_list: List[Dict[str, Any]], tenant_metadata: Optional[Dict[str, str]] = None) -> List[Document]:
+    """
+    Processes a list of text data into Documents with associated metadata.
+
+    Args:
+        text_list (List[Dict[str, Any]]): A list of dictionaries containing text data and metadata
+        tenant_metadata (Optional[Dict[str, str]]): Tenant partition fields added to every row
+
+    Returns:
+        List[Document]: A list of Document objects with processed text and metadata
+    """
+    documents = []
+
+    for text in text_list:
+        document_name = text.get('document_name', '')
+
+        for row in text.get('data', []):
+            question = row.get('question', '')
+
+            combined_metadata = {'document_name': document_name}
+
+            for key, value in row.items():
+                if key != 'question':
+                    combined_metadata[key] = value
+
+            combined_metadata['cluster_id'] = question_key(question)
+            combined_metadata.update(tenant_metadata or {})
+
+            # The cluster and tenant keys are for grouping and filtering only, keep them out
+            # of the embedding and the LLM context
+            excluded_keys = ['cluster_id', TENANT_PAYLOAD_KEY]
+            documents.append(Document(text=question,
+                                      metadata=combined_metadata,
+                                      excluded_embed_metadata_keys=excluded_keys,
+                                      excluded_llm_metadata_keys=excluded_keys))
+
+    return documents
+
+def previous_document_payloads(client: QdrantClient,
+                               collection_name: str,
+                               document_name: str,
+                               conditions: Optional[List[models.Condition]] = None,
+                               batch_size: int = 256) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads the carried-over payload of a document's stored points, keyed by node text.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Collection (or alias) holding the document
+        document_name (str): The document about to be re-ingested
+        conditions (Optional[List[models.Condition]]): Extra conditions, e.g. the tenant's
+
+    Returns:
+        Dict[str, Dict[str, Any]]: CARRIED_PAYLOAD_KEYS values per stored node text
+    """
+    previous = {}
+    if not client.collection_exists(collection_name):
+        return previous
+
+    scroll_filter = models.Filter(must=[
+        models.FieldCondition(key="document_name", match=models.MatchValue(value=document_name)),
+        *(conditions or [])
+    ])
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection_name,
+            scroll_filter=scroll_filter,
+            limit=batch_size,
+            offset=offset,
+            with_payload=["_node_content", *CARRIED_PAYLOAD_KEYS],
+            with_vectors=False
+        )
+        for point in points:
+            payload = point.payload or {}
+            carried = {key: payload[key] for key in CARRIED_PAYLOAD_KEYS if key in payload}
+            if carried and "_node_content" in payload:
+                previous[json.loads(payload["_node_content"]).get("text", "")] = carried
+        if offset is None:
+            break
+    return previous
+
+def restore_document_payloads(client: QdrantClient,
+                              collection_name: str,
+                              nodes: List[BaseNode],
+                              previous: Dict[str, Dict[str, Any]]) -> int:
+    """
+    Copies carried-over payload onto newly written nodes whose text was stored before.
+
+    Returns:
+        int: Number of points restored.
+    """
+    operations = [
+        models.SetPayloadOperation(set_payload=models.SetPayload(payload=previous[node.get_content()], points=[node.node_id]))
+        for node in nodes
+        if node.get_content() in previous
+    ]
+    if operations:
+        client.batch_update_points(collection_name=collection_name, update_operations=operations)
+    return len(operations)
+
+def ensure_document_index(client: QdrantClient, collection_name: str):
+    """
+    Create the document_name keyword index used by per-document deletes, reads and exports.
+    """
+    client.create_payload_index(
+        collection_name=collection_name,
+        field_name="document_name",
+        field_schema=models.PayloadSchemaType.KEYWORD
+    )
+
+def delete_stale_document_points(client: QdrantClient,
+                                 collection_name: str,
+                                 document_name: str,
+                                 keep_ids: List[str],
+                                 conditions: Optional[List[models.Condition]] = None):
+    """
+    Deletes a document's points except the ones just written for it.
+
+    Called after a document's new rows are upserted, so re-ingesting an edited document
+    replaces its rows instead of adding duplicates, and the document is never missing
+    from search in between.
+
+    Args:
+        client (QdrantClient): Qdrant client
+        collection_name (str): Collection (or alias) holding the document
+        document_name (str): The re-ingested document
+        keep_ids (List[str]): Point ids written by this ingestion
+        conditions (Optional[List[models.Condition]]): Extra conditions, e.g. the tenant's
+    """
+    client.delete(
+        collection_name=collection_name,
+        points_selector=models.FilterSelector(filter=models.Filter(
+            must=[
+                models.FieldCondition(key="document_name", match=models.MatchValue(value=document_name)),
+                *(conditions or [])
+            ],
+            must_not=[models.HasIdCondition(has_id=keep_ids)] if keep_ids else []
+        ))
+    )
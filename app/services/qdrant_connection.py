@@ -0,0 +1,94 @@
+# app/services/qdrant_connection.py
+import functools
+import threading
+from typing import Optional
+
+from qdrant_client import QdrantClient
+
+# Connection modes selected with QDRANT_MODE
+QDRANT_MODES = ("http", "grpc", "local")
+
+_client: Optional[QdrantClient] = None
+_client_lock = threading.Lock()
+
+class SerializedQdrantClient:
+    """
+    Wraps a client so that only one thread calls it at a time.
+
+    The embedded (local mode) client is not thread-safe, but it is shared by the API's
+    request threads, the job workers and the suggestion thread pools. Every method call
+    runs under one lock, so concurrent searches queue instead of corrupting the storage.
+    """
+
+    def __init__(self, client: QdrantClient):
+        self._client = client
+        self._lock = threading.RLock()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._client, name)
+        if not callable(attribute):
+            return attribute
+
+        @functools.wraps(attribute)
+        def locked(*args, **kwargs):
+            with self._lock:
+                return attribute(*args, **kwargs)
+        return locked
+
+def create_qdrant_client(settings, url: Optional[str] = None) -> QdrantClient:
+    """
+    Create a Qdrant client for the configured deployment mode.
+
+    - http:  REST/JSON to the Qdrant server (the original behaviour).
+    - grpc:  Protobuf over gRPC to the Qdrant server, which avoids serializing every
+             vector and payload as JSON.
+    - local: Embedded Qdrant storing data under QDRANT_STORAGE_PATH, with no network hop.
+             The storage is locked by the process that opens it, so only one process
+             (the API or an ingestion run) can use it at a time. The embedded client
+             isn't thread-safe, so its calls are serialized (see SerializedQdrantClient),
+             which makes local mode a fit for development and small deployments only.
+
+    This module takes the settings as an argument instead of importing them, so the
+    API (which imports settings as `config`) and the root scripts (which import
+    `app.config`) can both use it.
+
+    Args:
+        settings: The application settings.
+        url (Optional[str]): Server URL overriding QDRANT_SERVER (http/grpc modes only).
+
+    Returns:
+        QdrantClient: A new client.
+
+    Raises:
+        ValueError: If QDRANT_MODE is not one of the supported modes.
+    """
+    mode = settings.QDRANT_MODE
+    if mode == "local":
+        return SerializedQdrantClient(QdrantClient(path=settings.QDRANT_STORAGE_PATH))
+    if mode == "grpc":
+        return QdrantClient(url=url or settings.QDRANT_SERVER,
+                            port=settings.QDRANT_PORT,
+                            grpc_port=settings.QDRANT_GRPC_PORT,
+                            prefer_grpc=True)
+    if mode == "http":
+        return QdrantClient(url=url or settings.QDRANT_SERVER, port=settings.QDRANT_PORT)
+    raise ValueError(f"Unsupported QDRANT_MODE '{mode}', expected one of {', '.join(QDRANT_MODES)}")
+
+def get_qdrant_client(settings) -> QdrantClient:
+    """
+    Return the process-wide Qdrant client, creating it on first use.
+
+    All services share one client. This reuses its connection pool, and in local mode
+    it is required, because the embedded storage can only be opened once per process.
+
+    Args:
+        settings: The application settings.
+
+    Returns:
+        QdrantClient: The shared client.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = create_qdrant_client(settings)
+        return _client
@@ -0,0 +1,281 @@
+# app/services/qdrant_export.py
+import json
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from qdrant_client import models
+from pydantic import BaseModel
+from config import settings
+from services.qa_documents import CARRIED_PAYLOAD_KEYS
+from services.qdrant_connection import get_qdrant_client
+from services.tenancy import TENANT_PAYLOAD_KEY, tenant_collection, tenant_conditions
+
+# Payload keys that are not part of the QA schema: those written by llama_index's
+# QdrantVectorStore, the tenant partition key, and the dedupe clusters and precomputed
+# suggestions carried across re-ingestion
+INTERNAL_PAYLOAD_KEYS = {"doc_id", "document_id", "ref_doc_id", TENANT_PAYLOAD_KEY, *CARRIED_PAYLOAD_KEYS}
+
+class DocumentRow(BaseModel):
+    """
+    A single stored question/answer row.
+
+    Attributes:
+        node_id (str): Unique identifier of the point in Qdrant.
+        payload (Dict[str, Any]): Selected QA fields (question, answer, product, ...).
+        vector (Optional[List[float]]): The stored embedding, only present when requested.
+    """
+    node_id: str
+    payload: Dict[str, Any]
+    vector: Optional[List[float]] = None
+
+class DocumentPage(BaseModel):
+    """
+    A page of rows from the collection.
+
+    Attributes:
+        rows (List[DocumentRow]): Rows on this page.
+        next_cursor (Optional[str]): Cursor for the next page, or None on the last page.
+    """
+    rows: List[DocumentRow]
+    next_cursor: Optional[str] = None
+
+class QdrantExporter:
+    """
+    A service class for browsing and exporting the QA collection with Qdrant's scroll API.
+
+    Every read is a cursor-driven scroll over a bounded page, so listing and exporting use
+    constant memory regardless of how large the collection is. Vectors are never fetched
+    unless explicitly requested.
+
+    Attributes:
+        client (QdrantClient): Client for interacting with the Qdrant vector database.
+        collection_name (str): Name of the vector collection being read.
+        tenant (str): Tenant whose rows are read.
+    """
+
+    def __init__(self, client=None, collection_name: Optional[str] = None, tenant: Optional[str] = None):
+        """
+        Initialize the QdrantExporter with connection details for the Qdrant database.
+
+        Args:
+            client (QdrantClient, optional): Qdrant client to use.
+                                             Defaults to the shared client for QDRANT_MODE.
+            collection_name (str, optional): Name of the vector collection.
+                                             Defaults to the tenant's collection.
+            tenant (str, optional): Tenant whose rows are read. Defaults to DEFAULT_TENANT.
+        """
+        self.client = client or get_qdrant_client(settings)
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = collection_name or tenant_collection(settings, self.tenant)
+
+    def warm_up(self):
+        """
+        Open the Qdrant connection ahead of the first real request.
+        """
+        self.client.get_collection(self.collection_name)
+
+    def _build_filter(self, document_name: Optional[str] = None, product: Optional[str] = None) -> Optional[models.Filter]:
+        conditions = tenant_conditions(settings, self.tenant)
+        if document_name:
+            conditions.append(models.FieldCondition(key="document_name", match=models.MatchValue(value=document_name)))
+        elif document_name == "":
+            # Rows stored without a document name
+            conditions.append(models.Filter(should=[
+                models.IsEmptyCondition(is_empty=models.PayloadField(key="document_name")),
+                models.FieldCondition(key="document_name", match=models.MatchValue(value=""))
+            ]))
+        if product and product != "All":
+            conditions.append(models.FieldCondition(key="product", match=models.MatchValue(value=product)))
+        return models.Filter(must=conditions) if conditions else None
+
+    @staticmethod
+    def _payload_selector(fields: Optional[List[str]]) -> Union[bool, List[str]]:
+        # The question text only lives inside the serialized node, so asking for it means
+        # fetching _node_content
+        if not fields:
+            return True
+        return ["_node_content" if field == "question" else field for field in fields]
+
+    @staticmethod
+    def _parse_cursor(cursor: Optional[str]) -> Optional[Union[int, str]]:
+        # Point ids are either unsigned integers or UUIDs
+        if cursor is None:
+            return None
+        if cursor.isdigit():
+            return int(cursor)
+        try:
+            return str(uuid.UUID(cursor))
+        except ValueError:
+            raise ValueError(f"Invalid cursor '{cursor}'")
+
+    @staticmethod
+    def _to_row(payload: Dict[str, Any], fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        """
+        Convert a stored payload into a flat QA row.
+
+        Args:
+            payload (Dict[str, Any]): The raw point payload.
+            fields (Optional[List[str]]): Fields to keep; all QA fields when None.
+
+        Returns:
+            Dict[str, Any]: Row with question, answer, product and any extra metadata.
+        """
+        row = {}
+        if "_node_content" in payload:
+            row["question"] = json.loads(payload["_node_content"]).get("text", "")
+        for key, value in payload.items():
+            if not key.startswith("_") and key not in INTERNAL_PAYLOAD_KEYS:
+                row[key] = value
+        if fields:
+            row = {key: value for key, value in row.items() if key in fields}
+        return row
+
+    def list_documents(self,
+                       limit: int = 100,
+                       cursor: Optional[str] = None,
+                       document_name: Optional[str] = None,
+                       product: Optional[str] = None,
+                       fields: Optional[List[str]] = None,
+                       with_vectors: bool = False) -> DocumentPage:
+        """
+        Return one page of rows from the collection.
+
+        Args:
+            limit (int): Maximum number of rows on the page.
+            cursor (Optional[str]): Cursor returned by the previous page, None for the first page.
+            document_name (Optional[str]): Only return rows from this document.
+            product (Optional[str]): Only return rows for this product.
+            fields (Optional[List[str]]): Payload fields to return; all QA fields when None.
+            with_vectors (bool): Whether to include the stored embeddings.
+
+        Returns:
+            DocumentPage: The rows and the cursor for the next page.
+
+        Raises:
+            ValueError: If the cursor is not a point id.
+        """
+        points, next_offset = self.client.scroll(
+            collection_name=self.collection_name,
+            scroll_filter=self._build_filter(document_name, product),
+            limit=limit,
+            offset=self._parse_cursor(cursor),
+            with_payload=self._payload_selector(fields),
+            with_vectors=with_vectors
+        )
+
+        rows = [
+            DocumentRow(
+                node_id=str(point.id),
+                payload=self._to_row(point.payload or {}, fields),
+                vector=point.vector if with_vectors else None
+            )
+            for point in points
+        ]
+        return DocumentPage(rows=rows, next_cursor=str(next_offset) if next_offset is not None else None)
+
+    def iter_rows(self,
+                  document_name: Optional[str] = None,
+                  product: Optional[str] = None,
+                  with_vectors: bool = False,
+                  batch_size: int = 256) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over every matching row, fetching one page at a time.
+
+        Args:
+            document_name (Optional[str]): Only yield rows from this document ("" for rows
+                                           without a document name).
+            product (Optional[str]): Only yield rows for this product.
+            with_vectors (bool): Whether to include the stored embeddings as "vector".
+            batch_size (int): Number of points fetched per scroll request.
+
+        Yields:
+            Dict[str, Any]: One QA row per point, including its document_name.
+        """
+        offset = None
+        scroll_filter = self._build_filter(document_name, product)
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=True,
+                with_vectors=with_vectors
+            )
+            for point in points:
+                row = self._to_row(point.payload or {})
+                if with_vectors:
+                    row["vector"] = point.vector
+                yield row
+            if offset is None:
+                break
+
+    def document_names(self, product: Optional[str] = None, batch_size: int = 1024) -> List[str]:
+        """
+        Collect the distinct document names in the collection.
+
+        Only the document_name field is fetched, so memory grows with the number of
+        documents rather than the number of rows. Rows without a document name are
+        reported as "".
+
+        Args:
+            product (Optional[str]): Only consider rows for this product.
+            batch_size (int): Number of points fetched per scroll request.
+
+        Returns:
+            List[str]: Sorted distinct document names.
+        """
+        names = set()
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self._build_filter(product=product),
+                limit=batch_size,
+                offset=offset,
+                with_payload=["document_name"],
+                with_vectors=False
+            )
+            names.update((point.payload or {}).get("document_name", "") for point in points)
+            if offset is None:
+                break
+        return sorted(names)
+
+    def export_ndjson(self,
+                      document_name: Optional[str] = None,
+                      product: Optional[str] = None,
+                      with_vectors: bool = False) -> Iterator[str]:
+        """
+        Stream the collection as newline-delimited JSON, one row per line.
+
+        Yields:
+            str: A JSON-encoded row followed by a newline.
+        """
+        for row in self.iter_rows(document_name=document_name, product=product, with_vectors=with_vectors):
+            yield json.dumps(row) + "\n"
+
+    def export_json(self,
+                    document_name: Optional[str] = None,
+                    product: Optional[str] = None,
+                    with_vectors: bool = False) -> Iterator[str]:
+        """
+        Stream the collection in the questions_and_answers file schema.
+
+        Produces a JSON array of {"document_name": ..., "data": [...]} objects, one per
+        document, written incrementally so no document is held in memory. Each document is
+        read with a filtered scroll on the document_name keyword index, so the export reads
+        every row once. Rows without a document name are emitted under "".
+
+        Yields:
+            str: Consecutive fragments of the JSON array.
+        """
+        names = [document_name] if document_name else self.document_names(product=product)
+
+        yield "["
+        for index, name in enumerate(names):
+            yield ("," if index else "") + json.dumps({"document_name": name})[:-1] + ', "data": ['
+            for row_index, row in enumerate(self.iter_rows(document_name=name, product=product, with_vectors=with_vectors)):
+                row.pop("document_name", None)
+                yield ("," if row_index else "") + json.dumps(row)
+            yield "]}"
+        yield "]"
@@ -1,7 +1,9 @@
 # app/services/qdrant_update.py
 import json
-from qdrant_client import QdrantClient
+from typing import Optional
 from config import settings
+from services.qdrant_connection import get_qdrant_client
+from services.tenancy import tenant_collection, tenant_payload
 
 class QdrantUpdater:
     """
@@ -14,22 +16,29 @@ class QdrantUpdater:
     Attributes:
         client (QdrantClient): Client for interacting with the Qdrant vector database.
         collection_name (str): Name of the vector collection being updated.
+        tenant (str): Tenant whose points may be updated.
     """
 
-    def __init__(self, host=settings.QDRANT_SERVER, port=settings.QDRANT_PORT, collection_name=settings.QDRANT_VECTOR_COLLECTION):
+    def __init__(self, client=None, collection_name: Optional[str] = None, tenant: Optional[str] = None):
         """
         Initialize the QdrantUpdater with connection details for the Qdrant database.
 
         Args:
-            host (str, optional): Hostname of the Qdrant server. 
-                                  Defaults to value from settings.
-            port (int, optional): Port number for the Qdrant server. 
-                                  Defaults to value from settings.
+            client (QdrantClient, optional): Qdrant client to use.
+                                             Defaults to the shared client for QDRANT_MODE.
             collection_name (str, optional): Name of the vector collection. 
-                                             Defaults to value from settings.
+                                             Defaults to the tenant's collection.
+            tenant (str, optional): Tenant whose points may be updated. Defaults to DEFAULT_TENANT.
         """
-        self.client = QdrantClient(url=host, port=port)
-        self.collection_name = collection_name
+        self.client = client or get_qdrant_client(settings)
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = collection_name or tenant_collection(settings, self.tenant)
+
+    def warm_up(self):
+        """
+        Open the Qdrant connection ahead of the first real request.
+        """
+        self.client.get_collection(self.collection_name)
 
     def update_document(self, node_id: str, answer: str):
         """
@@ -57,6 +66,11 @@ class QdrantUpdater:
 
         # Get the first (and should be only) retrieved point
         point = retrieved_points[0]
+        
+        # In a shared collection, another tenant's point is treated as missing
+        for key, value in tenant_payload(settings, self.tenant).items():
+            if point.payload.get(key) != value:
+                raise ValueError(f"Point with node_id {node_id} not found")
 
         # Parse the node content from the payload
         node_content = json.loads(point.payload["_node_content"])
@@ -1,6 +1,8 @@
 # app/services/rag_question.py
 import logging
-from typing import List
+from typing import List, Optional
+
+from qdrant_client import models
 
 from llama_index.core import (
     VectorStoreIndex,
@@ -14,12 +16,15 @@ from llama_index.core.query_engine import RetrieverQueryEngine
 from llama_index.core.response_synthesizers.type import ResponseMode
 from llama_index.core.retrievers import VectorIndexRetriever
 from llama_index.core.storage.storage_context import StorageContext
+from llama_index.core.vector_stores import MetadataFilter, MetadataFilters
 from llama_index.vector_stores.qdrant import QdrantVectorStore
 from llama_index.postprocessor.cohere_rerank import CohereRerank
 from pydantic import BaseModel
-import qdrant_client
 from prompt import general_qa_prompt_tmpl_str
 from config import settings
+from services.qdrant_connection import get_qdrant_client
+from services.tenancy import tenant_collection, tenant_conditions, tenant_payload
+from services.warm_up import warm_up_retrieval
 
 class SourceNode(BaseModel):
     """
@@ -59,6 +64,8 @@ class RagQuestion:
     and generating answers using a language model and vector search.
 
     Attributes:
+        tenant (str): Tenant whose collection (or payload partition) is searched.
+        collection_name (str): Qdrant collection holding the tenant's data.
         llm: Language model used for generating responses.
         embed_model: Model used for embedding text.
         response_synthesizer: Synthesizes responses from retrieved nodes.
@@ -68,14 +75,17 @@ class RagQuestion:
         cohere_rerank: Cohere reranking processor for improving retrieval.
     """
 
-    def __init__(self, llm, embed_model):
+    def __init__(self, llm, embed_model, tenant: Optional[str] = None):
         """
         Initialize the RAG question answering system.
 
         Args:
             llm: Language model for generating responses.
             embed_model: Model for creating text embeddings.
+            tenant (Optional[str]): Tenant to search. Defaults to DEFAULT_TENANT.
         """
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = tenant_collection(settings, self.tenant)
         self.llm = llm
         self.embed_model = embed_model
 
@@ -85,12 +95,20 @@ class RagQuestion:
             response_mode=ResponseMode.TREE_SUMMARIZE
         )
         
-        self.client = qdrant_client.QdrantClient(url=settings.QDRANT_SERVER, port=settings.QDRANT_PORT)
-        self.vector_store = QdrantVectorStore(collection_name=settings.QDRANT_VECTOR_COLLECTION, client=self.client)
+        self.client = get_qdrant_client(settings)
+        self.vector_store = QdrantVectorStore(collection_name=self.collection_name, client=self.client)
         self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
         
         self.general_qa_prompt_tmpl_str = PromptTemplate(general_qa_prompt_tmpl_str)
-        self.cohere_rerank = CohereRerank(api_key=settings.COHERE_API_KEY, top_n=7)
+        self.cohere_rerank = CohereRerank(api_key=settings.COHERE_API_KEY, top_n=settings.ASK_RERANK_TOP_N)
+
+    def warm_up(self):
+        """
+        Open the OpenAI, Qdrant and Cohere connections ahead of the first real request.
+        """
+        conditions = tenant_conditions(settings, self.tenant)
+        warm_up_retrieval(self.client, self.collection_name, self.embed_model, self.cohere_rerank,
+                          query_filter=models.Filter(must=conditions) if conditions else None)
 
     def _query_index(self, query_engine: RetrieverQueryEngine, query: str) -> RESPONSE_TYPE:
         """
@@ -130,16 +148,20 @@ class RagQuestion:
                 embed_model=self.embed_model
             )
             
+            # Restrict retrieval to the tenant's points when tenants share a collection
+            tenant_filters = [MetadataFilter(key=key, value=value) for key, value in tenant_payload(settings, self.tenant).items()]
+            
             vector_retriever = VectorIndexRetriever(
                 index=vector_index,
-                similarity_top_k=25
+                similarity_top_k=settings.ASK_SIMILARITY_TOP_K,
+                filters=MetadataFilters(filters=tenant_filters) if tenant_filters else None
             )
             
             vector_query_engine = RetrieverQueryEngine(
                 retriever=vector_retriever,
                 response_synthesizer=self.response_synthesizer,
                 node_postprocessors=[
-                    SimilarityPostprocessor(similarity_cutoff=0.45), 
+                    SimilarityPostprocessor(similarity_cutoff=settings.ASK_SIMILARITY_CUTOFF), 
                     self.cohere_rerank
                 ],
             )
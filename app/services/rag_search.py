@@ -1,41 +1,32 @@
 # app/services/rag_search.py
-import json
 import logging
 from typing import Dict, List, Optional, Any
 
-import qdrant_client
+from qdrant_client import models
 from pydantic import BaseModel
 
 from llama_index.core import (
-    VectorStoreIndex,
     QueryBundle,
-    PromptTemplate,
-    get_response_synthesizer,
     set_global_handler
 )
-from llama_index.core.vector_stores import (
-    MetadataFilter,
-    MetadataFilters,
-    FilterOperator,
-)
-from llama_index.core.base.response.schema import RESPONSE_TYPE
+from llama_index.core.base.response.schema import RESPONSE_TYPE, PydanticResponse
 from llama_index.core.postprocessor import SimilarityPostprocessor
 from llama_index.core.query_engine import RetrieverQueryEngine
-from llama_index.core.response_synthesizers.type import ResponseMode
-from llama_index.core.retrievers import VectorIndexRetriever
+from llama_index.core.schema import NodeWithScore
 from llama_index.core.settings import Settings
-from llama_index.core.storage.storage_context import StorageContext
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.llms.openai import OpenAI
 from llama_index.postprocessor.cohere_rerank import CohereRerank
-from llama_index.vector_stores.qdrant import QdrantVectorStore
 
-from prompt import qa_prompt_tmpl_str
+from prompt import qa_chat_prompt
+from services.grouped_retriever import GroupedQdrantRetriever
+from services.suggested_answers import node_suggestion_hash, prompt_fingerprint, suggestion_synthesizers
+from services.structured_output import STRUCTURED_OUTPUT_ERRORS, extract_suggested_answer, suggestion_parse_stats
 
 from config import settings
-
-# Set a simple global error handler for llama_index
-set_global_handler("simple")
+from services.qdrant_connection import get_qdrant_client
+from services.tenancy import tenant_collection, tenant_company_name, tenant_conditions
+from services.warm_up import warm_up_retrieval
 
 class SourceNode(BaseModel):
     """
@@ -62,9 +53,11 @@ class QueryResponse(BaseModel):
 
     Attributes:
         suggested_answer (Optional[str]): The generated answer to the query, if available.
+        suggestion_source (Optional[str]): "precomputed" when served from ingest time, "llm" when generated live.
         source_nodes (List[SourceNode]): List of source nodes used to generate the answer.
     """
     suggested_answer: Optional[str] = None
+    suggestion_source: Optional[str] = None
     source_nodes: List[SourceNode]
     
 class RagSearch:
@@ -75,65 +68,91 @@ class RagSearch:
     and generating answers using OpenAI's language and embedding models.
 
     Attributes:
-        response_synthesizer: Synthesizes responses from retrieved nodes.
+        tenant (str): Tenant whose collection (or payload partition) is searched.
+        collection_name (str): Qdrant collection holding the tenant's data.
+        qa_prompt_fingerprint (str): Serialized suggestion prompt, part of the suggestion hash.
+        response_synthesizer: Synthesizes schema-constrained suggestions from retrieved nodes.
+        text_response_synthesizer: Free-text synthesizer used when structured output fails.
         client: Qdrant client for vector database interactions.
-        vector_store: Vector store for document embeddings.
-        storage_context: Storage context for the vector store.
         qa_prompt_tmpl: Prompt template for question answering.
         cohere_rerank: Cohere reranking processor for improving retrieval.
     """
 
-    def __init__(self):
+    def __init__(self, tenant: Optional[str] = None):
         """
         Initialize the RAG search system.
 
-        Sets up OpenAI language and embedding models, Qdrant vector store,
+        Sets up OpenAI language and embedding models, the Qdrant client,
         response synthesizer, and other necessary components.
+
+        Args:
+            tenant (Optional[str]): Tenant to search. Defaults to DEFAULT_TENANT.
         """
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = tenant_collection(settings, self.tenant)
+        company_name = tenant_company_name(settings, self.tenant)
+
+        # Set a simple global error handler for llama_index. Done here rather than at import
+        # time so importing this module has no side effects.
+        set_global_handler("simple")
+
         # Configure OpenAI models for language and embedding
         Settings.llm = OpenAI(model=settings.OPENAI_LLM_MODEL, temperature=settings.TEMPERATURE, api_key=settings.OPENAI_API_KEY)
         Settings.embed_model = OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)            
     
-        # Create response synthesizer with compact response mode
-        self.response_synthesizer = get_response_synthesizer(
-            llm=Settings.llm,
-            verbose=True, 
-            response_mode=ResponseMode.COMPACT
+        # Prompt with the static instructions as the system message and the per-request
+        # context/question last, so the prefix can be served from the provider's prompt cache
+        self.qa_prompt_tmpl = qa_chat_prompt(company_name)
+        self.qa_prompt_fingerprint = prompt_fingerprint(self.qa_prompt_tmpl)
+
+        # Compact synthesizer constrained to the SuggestedAnswer schema through function
+        # calling, and the free-text synthesizer used when structured output fails. The
+        # precomputed suggestions are generated with the same pair.
+        self.response_synthesizer, self.text_response_synthesizer = suggestion_synthesizers(
+            Settings.llm, self.qa_prompt_tmpl, verbose=True
         )
 
-        # Set up Qdrant vector store client and storage
-        self.client = qdrant_client.QdrantClient(url=settings.QDRANT_SERVER, port=settings.QDRANT_PORT)
-        self.vector_store = QdrantVectorStore(collection_name=settings.QDRANT_VECTOR_COLLECTION, client=self.client)
-        self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
+        # Qdrant client used by the grouped retriever
+        self.client = get_qdrant_client(settings)
+
+        # Configure reranking
+        self.cohere_rerank = CohereRerank(api_key=settings.COHERE_API_KEY, top_n=settings.QUERY_RERANK_TOP_N)
 
-        # Configure prompt template and reranking
-        self.qa_prompt_tmpl = PromptTemplate(qa_prompt_tmpl_str)
-        self.cohere_rerank = CohereRerank(api_key=settings.COHERE_API_KEY, top_n=3)
+    def warm_up(self):
+        """
+        Open the OpenAI, Qdrant and Cohere connections ahead of the first real request.
+        """
+        warm_up_retrieval(self.client, self.collection_name, Settings.embed_model,
+                          self.cohere_rerank, query_filter=self._query_filter("All"))
 
-    def _query_index(self, query_engine: RetrieverQueryEngine, query: str) -> RESPONSE_TYPE:
+    def _create_query_bundle(self, query: str) -> QueryBundle:
         """
-        Execute a query on the vector index.
+        Embed the query and wrap it in a QueryBundle.
 
         Args:
-            query_engine (RetrieverQueryEngine): Query engine to use for retrieval.
             query (str): The input query string.
 
         Returns:
-            RESPONSE_TYPE: The generated response from the query.
+            QueryBundle: The query text with its embedding.
+        """
+        # Embed the query using the configured embedding model
+        embedded_query = Settings.embed_model.get_text_embedding(query)
+        return QueryBundle(query_str=query, embedding=embedded_query)
 
-        Raises:
-            Exception: If there's an error during the query process.
+    def _query_filter(self, product: str) -> Optional[models.Filter]:
         """
-        try:
-            # Embed the query using the configured embedding model
-            embedded_query = Settings.embed_model.get_text_embedding(query)
-            
-            # Execute the query with both text and embedding
-            response = query_engine.query(QueryBundle(query_str=query, embedding=embedded_query))
-            return response
-        except Exception as e:
-            logging.error(f"Error querying index: {str(e)}")
-            raise
+        Build the payload filter for the tenant's partition and an optional product.
+
+        Args:
+            product (str): Product to filter results by. 'All' means no product filtering.
+
+        Returns:
+            Optional[models.Filter]: The filter, or None when nothing needs filtering.
+        """
+        conditions = tenant_conditions(settings, self.tenant)
+        if product != "All":
+            conditions.append(models.FieldCondition(key="product", match=models.MatchValue(value=product)))
+        return models.Filter(must=conditions) if conditions else None
 
     def _create_query_engine(self, product: str) -> RetrieverQueryEngine:
         """
@@ -148,27 +167,22 @@ class RagSearch:
         Raises:
             Exception: If there's an error creating the query engine.
         """
-        # Create metadata filter if a specific product is specified
-        filter = None
-        if product != "All":
-            filter = MetadataFilters(
-                filters=[
-                    MetadataFilter(key="product", operator=FilterOperator.EQ, value=product),
-                ],
-            )
+        # Restrict to the tenant and, if specified, the product
+        query_filter = self._query_filter(product)
             
         try:
-            # Create vector index from the vector store
-            vector_index = VectorStoreIndex.from_vector_store(
-                vector_store=self.vector_store, 
-                embed_model=Settings.embed_model
-            )
-            
-            # Create vector retriever with optional filtering
-            vector_retriever = VectorIndexRetriever(
-                index=vector_index, 
-                similarity_top_k=7,
-                filters=filter
+            # Retrieve one group per question cluster and diversify the candidates with MMR,
+            # so copies of the same question don't crowd out the reranker and the LLM
+            vector_retriever = GroupedQdrantRetriever(
+                client=self.client,
+                collection_name=self.collection_name,
+                embed_model=Settings.embed_model,
+                group_by=settings.QUERY_GROUP_BY,
+                group_size=settings.QUERY_GROUP_SIZE,
+                limit=settings.QUERY_CANDIDATE_GROUPS,
+                mmr_top_k=settings.QUERY_MMR_TOP_K,
+                mmr_lambda=settings.QUERY_MMR_LAMBDA,
+                query_filter=query_filter
             )
             
             # Create query engine with retriever, synthesizer, and post-processors
@@ -176,14 +190,11 @@ class RagSearch:
                 retriever=vector_retriever,
                 response_synthesizer=self.response_synthesizer,
                 node_postprocessors=[
-                    SimilarityPostprocessor(similarity_cutoff=0.45), 
+                    SimilarityPostprocessor(similarity_cutoff=settings.QUERY_SIMILARITY_CUTOFF), 
                     self.cohere_rerank
                 ],
             )
             
-            # Update prompt template for response synthesis
-            vector_query_engine.update_prompts({"response_synthesizer:text_qa_template": self.qa_prompt_tmpl})
-            
             return vector_query_engine
         except Exception as e:
             logging.error(f"Error creating query engine: {str(e)}")
@@ -193,6 +204,11 @@ class RagSearch:
         """
         Perform a Retrieval-Augmented Generation (RAG) query.
 
+        Retrieval and reranking run first. When the top hit is a strong match with an
+        up-to-date precomputed suggestion, that suggestion is served and the LLM is not
+        called; otherwise the suggestion is generated live. When nothing matches, the
+        response has no suggested answer and the LLM is not called.
+
         Args:
             query (str): The input query string.
             product (str, optional): Product to filter results by. Defaults to "All".
@@ -206,9 +222,28 @@ class RagSearch:
         try:
             # Create query engine with optional product filtering
             vector_query_engine = self._create_query_engine(product=product)
+            query_bundle = self._create_query_bundle(query)
             
-            # Execute the query
-            response = self._query_index(query_engine=vector_query_engine, query=query)
+            # Retrieve, filter and rerank the source nodes
+            nodes = vector_query_engine.retrieve(query_bundle)
+            if not nodes:
+                # Nothing to improve on: skip the LLM, whose "Empty Response" would be
+                # counted as a parse failure
+                logging.info("query_rag -> no matching rows")
+                return QueryResponse(source_nodes=[])
+            
+            # Serve the precomputed suggestion for strong matches
+            precomputed = self._precomputed_suggestion(nodes)
+            if precomputed is not None:
+                logging.info("query_rag -> serving precomputed suggested answer")
+                return QueryResponse(
+                    suggested_answer=precomputed,
+                    suggestion_source="precomputed",
+                    source_nodes=self._to_source_nodes(nodes)
+                )
+            
+            # Otherwise ask the LLM to improve the retrieved answers
+            response = self._synthesize(vector_query_engine, query_bundle, nodes)
             logging.info(f"query_rag -> response: {response}")
             
             # Process and return the response
@@ -217,37 +252,63 @@ class RagSearch:
             logging.error(f"Error in RAG query: {str(e)}")
             raise
 
-    def _process_response(self, response: RESPONSE_TYPE) -> QueryResponse:
+    def _synthesize(self, query_engine: RetrieverQueryEngine, query_bundle: QueryBundle, nodes: List[NodeWithScore]) -> RESPONSE_TYPE:
         """
-        Process the raw response into a structured QueryResponse.
-
-        Attempts to parse the response as JSON to extract a suggested answer.
+        Generate the suggested answer, falling back to free-text output if structured output
+        cannot be parsed. Other errors (network, rate limits) are raised without a retry.
 
         Args:
-            response (RESPONSE_TYPE): The raw response from the query engine.
+            query_engine (RetrieverQueryEngine): Query engine with the structured synthesizer.
+            query_bundle (QueryBundle): The embedded query.
+            nodes (List[NodeWithScore]): Reranked source nodes.
 
         Returns:
-            QueryResponse: Structured response with suggested answer and source nodes.
+            RESPONSE_TYPE: A PydanticResponse on success, a plain Response from the fallback.
         """
         try:
-            # Log the original response
-            logging.info(f"_process_response -> response.response: {response.response}")
-            
-            # Try to parse the response as JSON
-            parsed_response = json.loads(response.response)
-            logging.info(f"_process_response -> parsed_response: {parsed_response}")
-            
-            # Extract suggested answer, defaulting to None if not found
-            suggested_answer = parsed_response.get("suggested_answer", None)
-            logging.info(f"_process_response -> suggested_answer: {suggested_answer}")
-        
-        except json.JSONDecodeError:
-            # Handle JSON parsing errors
-            logging.error("Failed to parse JSON response")
-            suggested_answer = "Failed to extract suggested answer"
-        
-        # Create source nodes from the response
-        source_nodes = [
+            return query_engine.synthesize(query_bundle, nodes)
+        except STRUCTURED_OUTPUT_ERRORS as e:
+            logging.warning(f"Structured suggestion failed, retrying as free text: {str(e)}")
+            suggestion_parse_stats.record_retry()
+            return self.text_response_synthesizer.synthesize(query_bundle, nodes)
+
+    def _precomputed_suggestion(self, nodes: List[NodeWithScore]) -> Optional[str]:
+        """
+        Return the top node's precomputed suggestion if it can be served instead of an LLM call.
+
+        The top node must score at least SUGGESTION_REUSE_MIN_SCORE after reranking, and its
+        stored suggestion_hash must match its current question, answer, model and prompt.
+
+        Args:
+            nodes (List[NodeWithScore]): Reranked source nodes, best first.
+
+        Returns:
+            Optional[str]: The precomputed suggestion, or None to generate one live.
+        """
+        if not settings.SUGGESTION_REUSE_ENABLED or not nodes:
+            return None
+
+        top = nodes[0]
+        suggested_answer = top.node.metadata.get("suggested_answer")
+        if suggested_answer is None or (top.score or 0) < settings.SUGGESTION_REUSE_MIN_SCORE:
+            return None
+
+        current_hash = node_suggestion_hash(top.node, settings.OPENAI_LLM_MODEL, self.qa_prompt_fingerprint)
+        if top.node.metadata.get("suggestion_hash") != current_hash:
+            return None
+        return suggested_answer
+
+    def _to_source_nodes(self, nodes: List[NodeWithScore]) -> List[SourceNode]:
+        """
+        Convert retrieved nodes into SourceNode models.
+
+        Args:
+            nodes (List[NodeWithScore]): Retrieved source nodes.
+
+        Returns:
+            List[SourceNode]: Source nodes for the response.
+        """
+        return [
             SourceNode(
                 node_id=source_node.node.id_,
                 document_name=source_node.node.metadata.get('document_name', 'Unknown'),
@@ -256,8 +317,41 @@ class RagSearch:
                 answer=source_node.node.metadata.get('answer', 'No answer provided'),
                 score=source_node.score
             )
-            for source_node in response.source_nodes
+            for source_node in nodes
         ]
+
+    def _process_response(self, response: RESPONSE_TYPE) -> QueryResponse:
+        """
+        Process the raw response into a structured QueryResponse.
+
+        Structured responses carry a SuggestedAnswer. Free-text responses from the fallback
+        path go through the tolerant JSON extractor. Every outcome is counted in
+        suggestion_parse_stats.
+
+        Args:
+            response (RESPONSE_TYPE): The raw response from the query engine.
+
+        Returns:
+            QueryResponse: Structured response with suggested answer and source nodes.
+        """
+        if isinstance(response, PydanticResponse):
+            # Schema-constrained output, no parsing needed
+            suggested_answer = response.response.suggested_answer
+            suggestion_parse_stats.record("structured")
+        else:
+            # Free-text fallback, recovered with the tolerant extractor
+            logging.info(f"_process_response -> response.response: {response.response}")
+            suggested_answer = extract_suggested_answer(response.response)
+            if suggested_answer is None:
+                logging.error("Failed to extract suggested answer from response")
+                suggested_answer = "Failed to extract suggested answer"
+                suggestion_parse_stats.record("failed")
+            else:
+                suggestion_parse_stats.record("fallback")
+        logging.info(f"_process_response -> suggested_answer: {suggested_answer}")
+        
+        # Create source nodes from the response
+        source_nodes = self._to_source_nodes(response.source_nodes)
         
         # Log the final processed response details
         logging.info(f"Suggested Answer: {suggested_answer}")
@@ -266,5 +360,6 @@ class RagSearch:
         # Return structured query response
         return QueryResponse(
             suggested_answer=suggested_answer,
+            suggestion_source="llm",
             source_nodes=source_nodes
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,128 @@
+# app/services/structured_output.py
+import re
+import json
+import threading
+from typing import Any, Dict, Optional
+
+from pydantic import BaseModel, Field
+
+# Errors raised when the LLM's structured output cannot be parsed into the schema. Pydantic's
+# ValidationError and json's JSONDecodeError are ValueErrors, as is llama_index's "no tool
+# call" error; a tool call returning the wrong type raises TypeError. Anything else (network,
+# rate limits, auth) would fail the free-text retry too, so it is not retried.
+STRUCTURED_OUTPUT_ERRORS = (ValueError, TypeError)
+
+class SuggestedAnswer(BaseModel):
+    """
+    Schema the LLM fills in when suggesting an improved answer.
+
+    Attributes:
+        suggested_answer (str): The improved answer, or 'No suggested improvement'.
+    """
+    suggested_answer: str = Field(
+        description="The improved answer, or 'No suggested improvement' if no improvement is needed."
+    )
+
+def extract_json_string_field(text: str, field: str) -> Optional[str]:
+    """
+    Tolerantly extract one string field from free-form LLM output.
+
+    Handles the usual ways models break JSON: code fences, text before or after the
+    object, and invalid escapes. Output cut off before the value's closing quote is
+    rejected, since a truncated answer must not be served as a suggestion.
+
+    Args:
+        text (str): Raw LLM output.
+        field (str): Name of the JSON field to extract.
+
+    Returns:
+        Optional[str]: The field value, or None if the field is missing or truncated.
+    """
+    match = re.search(r'"' + re.escape(field) + r'"\s*:\s*"', text)
+    if not match:
+        return None
+
+    # Scan the string value up to its closing quote, honouring escapes
+    raw = []
+    index = match.end()
+    while index < len(text):
+        char = text[index]
+        if char == "\\":
+            raw.append(text[index:index + 2])
+            index += 2
+            continue
+        if char == '"':
+            break
+        raw.append(char)
+        index += 1
+    else:
+        # No closing quote: the output was cut off mid-value
+        return None
+
+    raw_value = "".join(raw)
+    try:
+        return json.loads(f'"{raw_value}"')
+    except json.JSONDecodeError:
+        # An invalid escape sequence (e.g. \x41) - keep the text as written
+        return raw_value.replace('\\"', '"').replace("\\n", "\n")
+
+def extract_suggested_answer(text: str) -> Optional[str]:
+    """
+    Extract the suggested answer from free-form LLM output.
+
+    Args:
+        text (str): Raw LLM output.
+
+    Returns:
+        Optional[str]: The suggested answer, or None if the output has no such field.
+    """
+    return extract_json_string_field(text or "", "suggested_answer")
+
+class ParseStats:
+    """
+    Thread-safe counters for how suggested answers were obtained from the LLM.
+
+    Outcomes:
+        structured: Parsed through schema-constrained (function calling) output.
+        fallback:   Structured output failed, recovered by the tolerant extractor.
+        failed:     No suggested answer could be extracted; the LLM call was wasted.
+
+    Every structured failure is retried as a second, free-text LLM call. Those calls are
+    counted as retries, so llm_calls shows what the suggestions actually cost.
+    """
+
+    OUTCOMES = ("structured", "fallback", "failed")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {outcome: 0 for outcome in self.OUTCOMES}
+        self._retries = 0
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._counts[outcome] += 1
+
+    def record_retry(self):
+        with self._lock:
+            self._retries += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns:
+            Dict[str, Any]: Counts per outcome, the total, the free-text retries, the LLM
+                            calls made and the parse failure rate.
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            retries = self._retries
+        total = sum(counts.values())
+        return {
+            **counts,
+            "total": total,
+            "retries": retries,
+            "llm_calls": total + retries,
+            "failure_rate": counts["failed"] / total if total else 0.0,
+        }
+
+# Process-wide counters for the suggestion path
+suggestion_parse_stats = ParseStats()
@@ -0,0 +1,249 @@
+# app/services/suggested_answers.py
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from qdrant_client import QdrantClient, models
+
+from llama_index.core import ChatPromptTemplate, QueryBundle, get_response_synthesizer
+from llama_index.core.response_synthesizers import BaseSynthesizer
+from llama_index.core.response_synthesizers.type import ResponseMode
+from llama_index.core.schema import BaseNode, NodeWithScore
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
+
+from .structured_output import STRUCTURED_OUTPUT_ERRORS, ParseStats, SuggestedAnswer, extract_suggested_answer
+
+# Top-level payload keys holding the precomputed suggestion. They are written next to
+# (not inside) _node_content so they never reach the embedding or the LLM context.
+SUGGESTION_PAYLOAD_KEYS = ("suggested_answer", "suggestion_hash")
+
+def suggestion_hash(question: str, answer: str, model: str, prompt_template: str) -> str:
+    """
+    Hash everything a suggestion depends on.
+
+    A stored suggestion is only valid while the question, the answer, the model and the
+    prompt are unchanged, so any of them changing (e.g. an answer edited through /update)
+    invalidates it.
+
+    Args:
+        question (str): The stored question.
+        answer (str): The stored answer.
+        model (str): The LLM model name.
+        prompt_template (str): The suggestion prompt template.
+
+    Returns:
+        str: SHA-256 hex digest.
+    """
+    digest = hashlib.sha256()
+    for part in (question, answer, model, prompt_template):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+def prompt_fingerprint(prompt: ChatPromptTemplate) -> str:
+    """
+    Serialize a chat prompt's messages, for use as the prompt part of a suggestion hash.
+    """
+    return "\n".join(f"{message.role.value}: {message.content}" for message in prompt.message_templates)
+
+def suggestion_synthesizers(llm, prompt: ChatPromptTemplate, verbose: bool = False) -> Tuple[BaseSynthesizer, BaseSynthesizer]:
+    """
+    Build the synthesizers that turn retrieved rows into a suggested answer.
+
+    /query and SuggestedAnswerGenerator both use these, so a precomputed suggestion sees
+    the same messages and the same context packing as a live one.
+
+    Returns:
+        Tuple[BaseSynthesizer, BaseSynthesizer]: The SuggestedAnswer (function calling)
+                                                 synthesizer and the free-text fallback.
+    """
+    structured = get_response_synthesizer(
+        llm=llm,
+        verbose=verbose,
+        response_mode=ResponseMode.COMPACT,
+        output_cls=SuggestedAnswer,
+        text_qa_template=prompt
+    )
+    text = get_response_synthesizer(
+        llm=llm,
+        verbose=verbose,
+        response_mode=ResponseMode.COMPACT,
+        text_qa_template=prompt
+    )
+    return structured, text
+
+def node_suggestion_hash(node: BaseNode, model: str, prompt_template: str) -> str:
+    """
+    Compute the suggestion hash for a stored node.
+    """
+    return suggestion_hash(node.get_content(), str(node.metadata.get("answer", "")), model, prompt_template)
+
+class SuggestedAnswerGenerator:
+    """
+    Generates and stores a suggested answer for every row of the collection ahead of time.
+
+    Rows are read page by page, suggestions for a page are generated concurrently, and
+    each page's results are written back before the next page is read. A row is skipped
+    when its stored suggestion_hash matches the current content, so an interrupted run
+    resumes where it stopped and later runs only regenerate changed rows. When rebuilding
+    into a fresh collection, suggestions from the previous collection are reused by hash.
+
+    Attributes:
+        client (QdrantClient): Client for interacting with the Qdrant vector database.
+        collection_name (str): Name of the collection being annotated.
+        llm: Language model used to generate suggestions.
+        model (str): Model name, part of the suggestion hash.
+        prompt (ChatPromptTemplate): Suggestion prompt, same as the live /query prompt.
+        prompt_fingerprint (str): Serialized prompt, part of the suggestion hash.
+        max_workers (int): Concurrent LLM requests.
+        previous_collection (Optional[str]): Collection whose suggestions are reused by hash.
+        scroll_filter (Optional[models.Filter]): Restricts the run to matching rows (e.g. one tenant).
+    """
+
+    def __init__(self,
+                 client: QdrantClient,
+                 collection_name: str,
+                 llm,
+                 model: str,
+                 prompt: ChatPromptTemplate,
+                 max_workers: int = 8,
+                 previous_collection: Optional[str] = None,
+                 scroll_filter: Optional[models.Filter] = None):
+        self.client = client
+        self.collection_name = collection_name
+        self.llm = llm
+        self.model = model
+        self.prompt = prompt
+        self.prompt_fingerprint = prompt_fingerprint(prompt)
+        self.synthesizer, self.text_synthesizer = suggestion_synthesizers(llm, prompt)
+        self.max_workers = max_workers
+        self.previous_collection = previous_collection
+        self.scroll_filter = scroll_filter
+        self.parse_stats = ParseStats()
+
+    def _load_previous_suggestions(self, batch_size: int = 1024) -> Dict[str, str]:
+        """
+        Map suggestion_hash to suggested_answer for every row of the previous collection.
+        """
+        previous = {}
+        if not self.previous_collection or self.previous_collection == self.collection_name:
+            return previous
+
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.previous_collection,
+                scroll_filter=self.scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=list(SUGGESTION_PAYLOAD_KEYS),
+                with_vectors=False
+            )
+            for point in points:
+                payload = point.payload or {}
+                if "suggestion_hash" in payload and "suggested_answer" in payload:
+                    previous[payload["suggestion_hash"]] = payload["suggested_answer"]
+            if offset is None:
+                break
+        return previous
+
+    def _generate(self, node: BaseNode) -> Optional[str]:
+        """
+        Ask the LLM for a suggested answer for a single stored row.
+
+        The row is synthesized as the only retrieved node with its question as the query,
+        through the same chat prompt and synthesizers as /query, so the LLM sees the same
+        messages it would when that row is the top hit.
+
+        Returns:
+            Optional[str]: The suggested answer, or None if the LLM output could not be parsed.
+                           Failed rows keep their old hash and are retried on the next run.
+        """
+        query_bundle = QueryBundle(query_str=node.get_content())
+        nodes = [NodeWithScore(node=node, score=1.0)]
+        try:
+            result = self.synthesizer.synthesize(query_bundle, nodes).response
+            self.parse_stats.record("structured")
+            return result.suggested_answer
+        except STRUCTURED_OUTPUT_ERRORS as e:
+            logging.warning(f"Structured suggestion failed for {node.id_}, retrying as free text: {str(e)}")
+            self.parse_stats.record_retry()
+        except Exception as e:
+            # Not a parse failure (e.g. a network error), so it is left out of the parse stats
+            logging.error(f"Failed to generate suggested answer for {node.id_}: {str(e)}")
+            return None
+
+        try:
+            suggested_answer = extract_suggested_answer(str(self.text_synthesizer.synthesize(query_bundle, nodes).response))
+        except Exception as e:
+            logging.error(f"Failed to generate suggested answer for {node.id_}: {str(e)}")
+            suggested_answer = None
+        self.parse_stats.record("fallback" if suggested_answer is not None else "failed")
+        return suggested_answer
+
+    def _pending(self, points) -> List[Tuple[Any, BaseNode, str]]:
+        pending = []
+        for point in points:
+            node = metadata_dict_to_node(point.payload)
+            current_hash = node_suggestion_hash(node, self.model, self.prompt_fingerprint)
+            if point.payload.get("suggestion_hash") != current_hash:
+                pending.append((point.id, node, current_hash))
+        return pending
+
+    def run(self, batch_size: int = 64) -> Dict[str, int]:
+        """
+        Generate suggestions for every row whose content changed since its last suggestion.
+
+        Args:
+            batch_size (int): Rows read, generated and written per page.
+
+        Returns:
+            Dict[str, int]: Counts of generated, reused, skipped (up to date) and failed rows.
+        """
+        stats = {"generated": 0, "reused": 0, "skipped": 0, "failed": 0}
+        previous = self._load_previous_suggestions()
+        offset = None
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                points, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=self.scroll_filter,
+                    limit=batch_size,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                pending = self._pending(points)
+                stats["skipped"] += len(points) - len(pending)
+
+                operations = []
+                to_generate = []
+                for point_id, node, current_hash in pending:
+                    if current_hash in previous:
+                        operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                            payload={"suggested_answer": previous[current_hash], "suggestion_hash": current_hash},
+                            points=[point_id]
+                        )))
+                        stats["reused"] += 1
+                    else:
+                        to_generate.append((point_id, node, current_hash))
+
+                suggestions = executor.map(lambda item: self._generate(item[1]), to_generate)
+                for (point_id, _, current_hash), suggested_answer in zip(to_generate, suggestions):
+                    if suggested_answer is None:
+                        stats["failed"] += 1
+                        continue
+                    operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                        payload={"suggested_answer": suggested_answer, "suggestion_hash": current_hash},
+                        points=[point_id]
+                    )))
+                    stats["generated"] += 1
+
+                if operations:
+                    self.client.batch_update_points(collection_name=self.collection_name, update_operations=operations)
+                    print(f"Stored {stats['generated']} generated and {stats['reused']} reused suggested answer(s) so far")
+
+                if offset is None:
+                    break
+        return stats
@@ -0,0 +1,177 @@
+# app/services/tenancy.py
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from qdrant_client import QdrantClient, models
+
+# Payload key partitioning a shared collection in TENANT_MODE=payload
+TENANT_PAYLOAD_KEY = "tenant_id"
+
+# Like qdrant_connection, these helpers take the settings as an argument so both the API
+# (`config`) and the root scripts (`app.config`) can use them.
+
+def resolve_tenant(settings, tenant: Optional[str]) -> str:
+    """
+    Validate a tenant id, falling back to the default tenant when none is given.
+
+    Args:
+        settings: The application settings.
+        tenant (Optional[str]): Requested tenant id.
+
+    Returns:
+        str: The tenant id.
+
+    Raises:
+        ValueError: If the tenant id is malformed or not configured.
+    """
+    # The configured ids were normalized the same way when the settings were loaded
+    tenant = settings.normalize_tenant_id(tenant or settings.DEFAULT_TENANT)
+    if tenant != settings.DEFAULT_TENANT and tenant not in settings.TENANTS:
+        raise ValueError(f"Unknown tenant '{tenant}'")
+    return tenant
+
+def tenant_collection(settings, tenant: str) -> str:
+    """
+    Return the collection (or alias) holding a tenant's data.
+
+    In collection mode every tenant except the default one gets <collection>_<tenant>,
+    so the default tenant keeps using the existing collection. In payload mode all
+    tenants share QDRANT_VECTOR_COLLECTION.
+    """
+    if settings.TENANT_MODE == "payload" or tenant == settings.DEFAULT_TENANT:
+        return settings.QDRANT_VECTOR_COLLECTION
+    return f"{settings.QDRANT_VECTOR_COLLECTION}_{tenant}"
+
+def tenant_qa_directory(settings, tenant: str) -> str:
+    """
+    Return the directory holding a tenant's QA JSON files.
+
+    The default tenant uses QA_DIRECTORY_PATH, other tenants a subdirectory named after them.
+    """
+    if tenant == settings.DEFAULT_TENANT:
+        return settings.QA_DIRECTORY_PATH
+    return os.path.join(settings.QA_DIRECTORY_PATH, tenant)
+
+def tenant_conversion_cache(settings, tenant: str) -> str:
+    """
+    Return the directory holding a tenant's questionnaire conversion cache.
+
+    Laid out like tenant_qa_directory, so a file converted for one tenant is never
+    mistaken for an unchanged file of another.
+    """
+    if tenant == settings.DEFAULT_TENANT:
+        return settings.CONVERSION_CACHE_PATH
+    return os.path.join(settings.CONVERSION_CACHE_PATH, tenant)
+
+def tenant_payload(settings, tenant: str) -> Dict[str, str]:
+    """
+    Return the payload fields that mark (and filter) a tenant's points.
+
+    Empty in collection mode, where the collection itself isolates tenants.
+    """
+    if settings.TENANT_MODE == "payload":
+        return {TENANT_PAYLOAD_KEY: tenant}
+    return {}
+
+def tenant_conditions(settings, tenant: str):
+    """
+    Return Qdrant filter conditions restricting a query to a tenant's points.
+    """
+    return [
+        models.FieldCondition(key=key, match=models.MatchValue(value=value))
+        for key, value in tenant_payload(settings, tenant).items()
+    ]
+
+def tenant_company_name(settings, tenant: str) -> str:
+    """
+    Return the company name used in a tenant's prompts.
+    """
+    return settings.TENANTS.get(tenant, {}).get("company_name", settings.COMPANY_NAME)
+
+def tenant_rate_limit(settings, tenant: str) -> int:
+    """
+    Return a tenant's request limit per minute (0 means unlimited).
+    """
+    return int(settings.TENANTS.get(tenant, {}).get("rate_limit_per_minute", settings.TENANT_RATE_LIMIT_PER_MINUTE))
+
+def ensure_tenant_index(client: QdrantClient, collection_name: str):
+    """
+    Create the tenant payload index so Qdrant co-locates and filters each tenant's points efficiently.
+    """
+    client.create_payload_index(
+        collection_name=collection_name,
+        field_name=TENANT_PAYLOAD_KEY,
+        field_schema=models.KeywordIndexParams(type=models.KeywordIndexType.KEYWORD, is_tenant=True)
+    )
+
+def claim_untagged_points(client: QdrantClient, collection_name: str, tenant: str) -> int:
+    """
+    Assign every point without a tenant_id to a tenant.
+
+    Points written before TENANT_MODE=payload was enabled carry no tenant_id and are
+    invisible to every tenant's filtered reads until they are claimed. This is a one-time
+    upgrade step.
+
+    Returns:
+        int: Number of points claimed.
+    """
+    untagged = models.Filter(must=[models.IsEmptyCondition(is_empty=models.PayloadField(key=TENANT_PAYLOAD_KEY))])
+    count = client.count(collection_name=collection_name, count_filter=untagged, exact=True).count
+    if count:
+        client.set_payload(collection_name=collection_name, payload={TENANT_PAYLOAD_KEY: tenant}, points=untagged)
+    return count
+
+class TenantRateLimiter:
+    """
+    Per-tenant token bucket rate limiter.
+
+    Each tenant's bucket holds up to its per-minute limit and refills continuously, so
+    short bursts are allowed while the sustained rate stays at the limit.
+    """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, list] = {}
+
+    def _take(self, tenant: str) -> float:
+        """
+        Take one token if available.
+
+        Returns:
+            float: 0 if a token was taken, otherwise seconds until one is available.
+        """
+        limit = tenant_rate_limit(self.settings, tenant)
+        if limit <= 0:
+            return 0.0
+
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(tenant, [float(limit), now])
+            tokens = min(float(limit), tokens + (now - updated) * limit / 60.0)
+            allowed = tokens >= 1.0
+            self._buckets[tenant] = [tokens - 1.0 if allowed else tokens, now]
+            return 0.0 if allowed else (1.0 - tokens) * 60.0 / limit
+
+    def allow(self, tenant: str) -> bool:
+        """
+        Take one token from the tenant's bucket.
+
+        Returns:
+            bool: False if the tenant is over its limit.
+        """
+        return self._take(tenant) == 0.0
+
+    def wait(self, tenant: str):
+        """
+        Block until a token is available and take it.
+
+        Background jobs call this once per row, so their LLM calls draw on the same
+        per-tenant budget as API requests instead of bypassing it.
+        """
+        delay = self._take(tenant)
+        while delay > 0:
+            time.sleep(delay)
+            delay = self._take(tenant)
@@ -0,0 +1,39 @@
+# app/services/warm_up.py
+from typing import Optional
+
+from qdrant_client import QdrantClient, models
+
+from llama_index.core.postprocessor.types import BaseNodePostprocessor
+from llama_index.core.schema import NodeWithScore, TextNode
+
+def warm_up_retrieval(client: QdrantClient,
+                      collection_name: str,
+                      embed_model,
+                      reranker: BaseNodePostprocessor,
+                      query_filter: Optional[models.Filter] = None):
+    """
+    Open the OpenAI, Qdrant and Cohere connections ahead of the first real request.
+
+    Embeds a dummy query, runs it against the collection and reranks a dummy node so
+    connection setup (DNS, TLS, HTTP pools) is paid at startup instead of on the first
+    /query or /ask. Shared by RagSearch and RagQuestion.
+
+    Args:
+        client (QdrantClient): Client for the Qdrant vector database.
+        collection_name (str): Collection (or alias) searched.
+        embed_model: Embedding model used for queries.
+        reranker (BaseNodePostprocessor): The Cohere reranker.
+        query_filter (Optional[models.Filter]): Filter applied to the search, e.g. the tenant's.
+    """
+    embedding = embed_model.get_text_embedding("warm-up")
+    client.query_points(
+        collection_name=collection_name,
+        query=embedding,
+        query_filter=query_filter,
+        limit=1,
+        with_payload=False
+    )
+    reranker.postprocess_nodes(
+        [NodeWithScore(node=TextNode(text="warm-up"), score=1.0)],
+        query_str="warm-up"
+    )
@@ -0,0 +1,91 @@
+# bench_qdrant.py
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+
+import numpy as np
+from qdrant_client import models
+
+from app.config import settings
+from app.services.qdrant_connection import QDRANT_MODES, create_qdrant_client
+
+BENCH_COLLECTION = "bench_qdrant_modes"
+
+def benchmark_mode(mode: str, vectors: np.ndarray, queries: np.ndarray, top_k: int) -> Dict[str, float]:
+    """
+    Loads the vectors into a scratch collection using one connection mode and times searches against it.
+
+    Local mode uses a temporary directory so it never touches QDRANT_STORAGE_PATH.
+
+    Args:
+        mode (str): One of QDRANT_MODES
+        vectors (np.ndarray): Vectors to load
+        queries (np.ndarray): Query vectors, one search each
+        top_k (int): Results requested per search
+
+    Returns:
+        Dict[str, float]: Upsert time and search latency percentiles in milliseconds
+    """
+    mode_settings = settings.model_copy(update={"QDRANT_MODE": mode, "QDRANT_STORAGE_PATH": tempfile.mkdtemp()})
+    client = create_qdrant_client(mode_settings)
+
+    if client.collection_exists(BENCH_COLLECTION):
+        client.delete_collection(BENCH_COLLECTION)
+    client.create_collection(
+        collection_name=BENCH_COLLECTION,
+        vectors_config=models.VectorParams(size=vectors.shape[1], distance=models.Distance.COSINE)
+    )
+
+    start = time.perf_counter()
+    client.upload_collection(
+        collection_name=BENCH_COLLECTION,
+        vectors=vectors,
+        payload=({"answer": "x" * 300, "document_name": f"doc_{i % 50}"} for i in range(len(vectors))),
+        batch_size=256,
+        wait=True
+    )
+    upsert_ms = (time.perf_counter() - start) * 1000
+
+    latencies: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        client.query_points(collection_name=BENCH_COLLECTION, query=query.tolist(), limit=top_k, with_payload=True)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    client.delete_collection(BENCH_COLLECTION)
+    client.close()
+    return {
+        "upsert_ms": upsert_ms,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "mean_ms": float(np.mean(latencies)),
+    }
+
+def main():
+    """
+    Compares search latency of the http, grpc and local (embedded) Qdrant modes.
+    """
+    parser = argparse.ArgumentParser(description='Benchmark Qdrant connection modes')
+    parser.add_argument('--modes', nargs='+', default=list(QDRANT_MODES), choices=QDRANT_MODES)
+    parser.add_argument('--points', type=int, default=5000, help='Number of vectors loaded')
+    parser.add_argument('--queries', type=int, default=200, help='Number of searches timed')
+    parser.add_argument('--dim', type=int, default=3072, help='Vector dimension (text-embedding-3-large is 3072)')
+    parser.add_argument('--top_k', type=int, default=10)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((args.points, args.dim)).astype(np.float32)
+    queries = rng.standard_normal((args.queries, args.dim)).astype(np.float32)
+
+    print(f"{'mode':<8}{'upsert ms':>12}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}")
+    for mode in args.modes:
+        try:
+            result = benchmark_mode(mode, vectors, queries, args.top_k)
+        except Exception as e:
+            print(f"{mode:<8} failed: {str(e)}")
+            continue
+        print(f"{mode:<8}{result['upsert_ms']:>12.0f}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}{result['mean_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
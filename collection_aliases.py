@@ -0,0 +1,254 @@
+# collection_aliases.py
+import time
+import argparse
+from typing import List, Optional
+
+import qdrant_client
+from qdrant_client import models
+
+from app.config import settings
+from app.services.qdrant_connection import create_qdrant_client
+from app.services.tenancy import resolve_tenant, tenant_collection
+
+# Qdrant's default indexing threshold (in KB), restored once a bulk load completes
+DEFAULT_INDEXING_THRESHOLD = 20000
+
+# Threshold used while finishing a bulk load: low enough that every segment gets an HNSW
+# index, so the indexed vector count is guaranteed to reach the point count
+BULK_LOAD_INDEXING_THRESHOLD = 1
+
+class CollectionAliasManager:
+    """
+    Manages versioned shadow collections behind the alias the API reads from.
+
+    A rebuild writes into a new collection named <alias>_v<timestamp> with HNSW indexing
+    disabled, re-enables indexing once the load completes, and then atomically repoints
+    the alias. Queries never see a half-built collection, and the previous version
+    stays around for rollback.
+
+    The embedded (QDRANT_MODE=local) store has no HNSW optimizer and always reports zero
+    indexed vectors, so in local mode indexing is left alone and finishing a bulk load
+    only waits for the collection to turn GREEN.
+
+    Attributes:
+        client: A Qdrant client instance for vector database operations
+        alias: Name the API queries (QDRANT_VECTOR_COLLECTION)
+        local_mode: Whether the client is the embedded local store
+    """
+
+    def __init__(self,
+                 client: qdrant_client.QdrantClient,
+                 alias: str = settings.QDRANT_VECTOR_COLLECTION,
+                 local_mode: bool = settings.QDRANT_MODE == "local"):
+        """
+        Initializes the manager.
+
+        Args:
+            client (qdrant_client.QdrantClient): Connected Qdrant client
+            alias (str): Alias served to the API
+            local_mode (bool): Whether the client is the embedded local store
+        """
+        self.client = client
+        self.alias = alias
+        self.local_mode = local_mode
+
+    def versions(self) -> List[str]:
+        """
+        Lists the versioned collections behind the alias, oldest first.
+
+        Returns:
+            List[str]: Collection names matching <alias>_v<timestamp>
+        """
+        prefix = f"{self.alias}_v"
+        names = [collection.name for collection in self.client.get_collections().collections]
+        return sorted(name for name in names if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+    def current_version(self) -> Optional[str]:
+        """
+        Returns the collection the alias currently points to, or None if the alias doesn't exist.
+        """
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.alias:
+                return alias.collection_name
+        return None
+
+    def create_shadow_collection(self, vector_size: int) -> str:
+        """
+        Creates a new versioned collection with HNSW indexing deferred for bulk loading.
+
+        Args:
+            vector_size (int): Dimension of the embedding vectors
+
+        Returns:
+            str: Name of the new collection
+        """
+        name = f"{self.alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config=models.VectorParams(size=vector_size, distance=models.Distance.COSINE),
+            # An indexing threshold of 0 disables HNSW construction while points are loaded
+            optimizers_config=None if self.local_mode else models.OptimizersConfigDiff(indexing_threshold=0)
+        )
+        print(f"Created shadow collection {name}")
+        return name
+
+    def finish_bulk_load(self, collection_name: str, timeout: float = 1800, poll_interval: float = 2):
+        """
+        Re-enables indexing and waits for the optimizer to build the index.
+
+        The collection can still report GREEN right after the update, before the optimizer
+        has started, so the wait also requires every point to be in an indexed segment.
+        The normal indexing threshold is restored afterwards for incremental writes. In
+        local mode only the GREEN status is awaited.
+
+        Args:
+            collection_name (str): The shadow collection that was loaded
+            timeout (float): Seconds to wait for the index to be built
+            poll_interval (float): Seconds between status checks
+
+        Raises:
+            TimeoutError: If indexing doesn't finish within the timeout
+        """
+        if not self.local_mode:
+            self.client.update_collection(
+                collection_name=collection_name,
+                optimizers_config=models.OptimizersConfigDiff(indexing_threshold=BULK_LOAD_INDEXING_THRESHOLD)
+            )
+        self.client.create_payload_index(
+            collection_name=collection_name,
+            field_name="cluster_id",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
+        deadline = time.monotonic() + timeout
+        while True:
+            info = self.client.get_collection(collection_name)
+            if info.status == models.CollectionStatus.GREEN and (
+                    self.local_mode or (info.indexed_vectors_count or 0) >= (info.points_count or 0)):
+                break
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Indexing of {collection_name} did not finish within {timeout} seconds")
+            time.sleep(poll_interval)
+
+        if self.local_mode:
+            print(f"{collection_name} is ready ({info.points_count} points)")
+            return
+        self.client.update_collection(
+            collection_name=collection_name,
+            optimizers_config=models.OptimizersConfigDiff(indexing_threshold=DEFAULT_INDEXING_THRESHOLD)
+        )
+        print(f"Indexing of {collection_name} complete ({info.indexed_vectors_count} vectors indexed)")
+
+    def validate(self, collection_name: str, expected_points: int):
+        """
+        Checks that the shadow collection holds every point that was written.
+
+        Args:
+            collection_name (str): The shadow collection that was loaded
+            expected_points (int): Number of nodes written
+
+        Raises:
+            ValueError: If the collection is empty or the point count doesn't match
+        """
+        count = self.client.count(collection_name=collection_name, exact=True).count
+        if count == 0 or count != expected_points:
+            raise ValueError(f"{collection_name} holds {count} points, expected {expected_points}")
+        print(f"Validated {collection_name}: {count} points")
+
+    def switch_alias(self, collection_name: str):
+        """
+        Atomically points the alias at a collection.
+
+        Args:
+            collection_name (str): Collection the alias should serve
+        """
+        operations = []
+        if self.current_version() is not None:
+            operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=self.alias)))
+        operations.append(models.CreateAliasOperation(
+            create_alias=models.CreateAlias(collection_name=collection_name, alias_name=self.alias)))
+
+        # Both operations are applied in a single request, so queries never see a missing alias
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+        print(f"Alias {self.alias} -> {collection_name}")
+
+    def migrate_plain_collection(self):
+        """
+        Deletes a plain (non-alias) collection that holds the alias name.
+
+        Qdrant doesn't allow an alias and a collection to share a name, so a deployment
+        that predates blue/green reindexing needs this once. Queries fail between the
+        delete and the first alias switch.
+        """
+        if self.has_plain_collection():
+            print(f"Deleting plain collection {self.alias} so it can be replaced by an alias")
+            self.client.delete_collection(self.alias)
+
+    def has_plain_collection(self) -> bool:
+        """
+        Returns True when a real collection, not an alias, uses the alias name.
+        """
+        return self.alias in [collection.name for collection in self.client.get_collections().collections]
+
+    def rollback(self) -> str:
+        """
+        Points the alias back at the version before the current one.
+
+        Returns:
+            str: Name of the collection now served
+
+        Raises:
+            ValueError: If there is no older version to roll back to
+        """
+        versions = self.versions()
+        current = self.current_version()
+        if current not in versions or versions.index(current) == 0:
+            raise ValueError(f"No earlier version of {self.alias} to roll back to")
+
+        previous = versions[versions.index(current) - 1]
+        self.switch_alias(previous)
+        return previous
+
+    def prune(self, keep: int = 2):
+        """
+        Deletes old versions, keeping the newest ones and whatever the alias serves.
+
+        Args:
+            keep (int): Number of most recent versions to keep
+        """
+        current = self.current_version()
+        versions = self.versions()
+        for name in versions[:max(len(versions) - keep, 0)]:
+            if name != current:
+                print(f"Deleting old version {name}")
+                self.client.delete_collection(name)
+
+def main():
+    """
+    Lists the versions behind the collection alias, or rolls the alias back one version.
+    """
+    parser = argparse.ArgumentParser(description='Manage versioned Question and Answer collections behind the query alias')
+    parser.add_argument('--rollback', action='store_true',
+                       help='Point the alias back to the previous collection version')
+    parser.add_argument('--tenant', type=str, default=None,
+                       help='Tenant whose collection alias is managed (DEFAULT_TENANT if omitted)')
+    args = parser.parse_args()
+
+    try:
+        tenant = resolve_tenant(settings, args.tenant)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    client = create_qdrant_client(settings)
+    manager = CollectionAliasManager(client, alias=tenant_collection(settings, tenant))
+
+    if args.rollback:
+        manager.rollback()
+        return
+
+    current = manager.current_version()
+    for name in manager.versions():
+        print(f"{'*' if name == current else ' '} {name}")
+
+if __name__ == "__main__":
+    main()
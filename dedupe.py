@@ -0,0 +1,284 @@
+# dedupe.py
+import json
+import argparse
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from qdrant_client import models
+
+from app.config import settings
+from app.services.qdrant_connection import create_qdrant_client
+from app.services.tenancy import resolve_tenant, tenant_collection, tenant_conditions
+
+class NearDuplicateFinder:
+    """
+    Finds near-duplicate questions in the QA collection and picks a canonical answer for each group.
+
+    Vectors are pulled from Qdrant in batches and blocked with random-hyperplane LSH, so
+    similarities are only computed inside buckets of likely neighbours instead of across
+    all n² pairs. Pairs above the similarity threshold are merged with union-find into
+    clusters.
+
+    Two vectors at cosine similarity s share a table's bucket with probability p^bits,
+    where p = 1 - arccos(s)/pi, so a pair is found with probability
+    1 - (1 - p^bits)^tables. The defaults (12 bits, 16 tables) find about 98% of pairs
+    at 0.93, 93% at 0.90 and 99.5% at 0.95, while comparing about 3% of unrelated pairs
+    (similarity around 0.3). Union-find recovers some missed pairs through other members
+    of the same cluster.
+
+    Attributes:
+        client: A Qdrant client instance for vector database operations
+        tenant: Tenant whose questions are clustered
+        collection_name: Name of the collection being analysed
+        threshold: Cosine similarity above which two questions are considered duplicates
+        num_tables: Number of independent LSH hash tables (more tables, better recall)
+        num_bits: Number of hyperplanes per table (more bits, smaller buckets)
+    """
+
+    def __init__(self,
+                 tenant: Optional[str] = None,
+                 threshold: float = 0.93,
+                 num_tables: int = 16,
+                 num_bits: int = 12,
+                 seed: int = 42):
+        """
+        Initializes the finder with the Qdrant connection and clustering parameters.
+        """
+        self.client = create_qdrant_client(settings)
+        self.tenant = tenant or settings.DEFAULT_TENANT
+        self.collection_name = tenant_collection(settings, self.tenant)
+        # Tenants sharing a collection are clustered separately
+        conditions = tenant_conditions(settings, self.tenant)
+        self.scroll_filter = models.Filter(must=conditions) if conditions else None
+        self.threshold = threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.rng = np.random.default_rng(seed)
+
+    def fetch_vectors(self, batch_size: int = 512) -> Tuple[np.ndarray, List[Any], List[Dict[str, Any]]]:
+        """
+        Pulls every stored vector and the fields needed for the report, one scroll page at a time.
+
+        Args:
+            batch_size (int): Number of points fetched per scroll request
+
+        Returns:
+            Tuple[np.ndarray, List[Any], List[Dict[str, Any]]]: L2-normalized float32 vectors,
+            the matching point ids and a {question, answer, document_name, product} dict per point
+        """
+        ids, rows, batches = [], [], []
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=self.scroll_filter,
+                limit=batch_size,
+                offset=offset,
+                with_payload=["_node_content", "answer", "document_name", "product"],
+                with_vectors=True
+            )
+            if points:
+                batches.append(np.asarray([point.vector for point in points], dtype=np.float32))
+            for point in points:
+                payload = point.payload or {}
+                ids.append(point.id)
+                rows.append({
+                    "question": json.loads(payload.get("_node_content", "{}")).get("text", ""),
+                    "answer": payload.get("answer", ""),
+                    "document_name": payload.get("document_name", ""),
+                    "product": payload.get("product", ""),
+                })
+            if offset is None:
+                break
+
+        if not batches:
+            return np.zeros((0, 0), dtype=np.float32), ids, rows
+
+        vectors = np.concatenate(batches)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors /= np.where(norms == 0, 1, norms)
+        return vectors, ids, rows
+
+    def _lsh_buckets(self, vectors: np.ndarray) -> List[np.ndarray]:
+        """
+        Hashes vectors into buckets with random hyperplanes, one set of buckets per table.
+
+        Returns:
+            List[np.ndarray]: Index arrays of every bucket holding more than one vector
+        """
+        buckets = []
+        powers = 1 << np.arange(self.num_bits, dtype=np.int64)
+        for _ in range(self.num_tables):
+            planes = self.rng.standard_normal((vectors.shape[1], self.num_bits)).astype(np.float32)
+            keys = ((vectors @ planes) > 0).astype(np.int64) @ powers
+
+            order = np.argsort(keys, kind="stable")
+            boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+            for bucket in np.split(order, boundaries):
+                if len(bucket) > 1:
+                    buckets.append(bucket)
+        return buckets
+
+    def cluster(self, vectors: np.ndarray, block_size: int = 1024) -> List[List[int]]:
+        """
+        Groups near-duplicate vectors into clusters.
+
+        Args:
+            vectors (np.ndarray): L2-normalized vectors, one per row
+            block_size (int): Rows compared at once inside large buckets, bounding memory use
+
+        Returns:
+            List[List[int]]: Clusters of row indexes, only those with two or more members
+        """
+        parent = np.arange(len(vectors))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for bucket in self._lsh_buckets(vectors):
+            bucket_vectors = vectors[bucket]
+            for start in range(0, len(bucket), block_size):
+                similarities = bucket_vectors[start:start + block_size] @ bucket_vectors.T
+                rows, cols = np.nonzero(similarities >= self.threshold)
+                for row, col in zip(rows + start, cols):
+                    if row < col:
+                        root_a, root_b = find(bucket[row]), find(bucket[col])
+                        if root_a != root_b:
+                            parent[root_b] = root_a
+
+        clusters = defaultdict(list)
+        for index in range(len(vectors)):
+            clusters[find(index)].append(index)
+        return [members for members in clusters.values() if len(members) > 1]
+
+    @staticmethod
+    def pick_canonical(members: List[int], rows: List[Dict[str, Any]]) -> int:
+        """
+        Picks the canonical row of a cluster: the most common answer, ties broken by the longest.
+
+        Returns:
+            int: Index of the canonical row
+        """
+        answers = Counter(" ".join(rows[i]["answer"].lower().split()) for i in members)
+        return max(members, key=lambda i: (answers[" ".join(rows[i]["answer"].lower().split())], len(rows[i]["answer"])))
+
+    def build_report(self, clusters: List[List[int]], ids: List[Any], rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Builds the canonical-answer report.
+
+        Returns:
+            Dict[str, Any]: Summary counts plus one entry per cluster with its canonical answer,
+            its duplicates and whether the duplicates' answers diverge from the canonical one
+        """
+        report_clusters = []
+        for members in clusters:
+            canonical = self.pick_canonical(members, rows)
+            canonical_answer = " ".join(rows[canonical]["answer"].lower().split())
+            duplicates = [i for i in members if i != canonical]
+            report_clusters.append({
+                "cluster_id": str(ids[canonical]),
+                "canonical": {"node_id": str(ids[canonical]), **rows[canonical]},
+                "duplicates": [{"node_id": str(ids[i]), **rows[i]} for i in duplicates],
+                "divergent_answers": any(" ".join(rows[i]["answer"].lower().split()) != canonical_answer for i in duplicates),
+            })
+
+        report_clusters.sort(key=lambda cluster: len(cluster["duplicates"]), reverse=True)
+        return {
+            "total_points": len(ids),
+            "clusters": len(report_clusters),
+            "duplicate_points": sum(len(cluster["duplicates"]) for cluster in report_clusters),
+            "divergent_clusters": sum(cluster["divergent_answers"] for cluster in report_clusters),
+            "threshold": self.threshold,
+            "results": report_clusters,
+        }
+
+    def mark_duplicates(self, clusters: List[List[int]], ids: List[Any], rows: List[Dict[str, Any]], batch_size: int = 256):
+        """
+        Writes cluster_id and is_duplicate into every point's payload.
+
+        Points outside any cluster become their own cluster, so every point carries a
+        cluster_id that retrieval can group or collapse on.
+
+        Args:
+            clusters (List[List[int]]): Clusters returned by cluster()
+            ids (List[Any]): Point ids, aligned with the vectors
+            rows (List[Dict[str, Any]]): Report fields, aligned with the vectors
+            batch_size (int): Number of payload operations sent per request
+        """
+        operations = []
+        clustered = set()
+        for members in clusters:
+            canonical = self.pick_canonical(members, rows)
+            duplicates = [ids[i] for i in members if i != canonical]
+            clustered.update(members)
+            operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload={"cluster_id": str(ids[canonical]), "is_duplicate": False}, points=[ids[canonical]])))
+            operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                payload={"cluster_id": str(ids[canonical]), "is_duplicate": True}, points=duplicates)))
+
+        for index, point_id in enumerate(ids):
+            if index not in clustered:
+                operations.append(models.SetPayloadOperation(set_payload=models.SetPayload(
+                    payload={"cluster_id": str(point_id), "is_duplicate": False}, points=[point_id])))
+
+        for start in range(0, len(operations), batch_size):
+            self.client.batch_update_points(
+                collection_name=self.collection_name,
+                update_operations=operations[start:start + batch_size]
+            )
+
+        self.client.create_payload_index(
+            collection_name=self.collection_name,
+            field_name="cluster_id",
+            field_schema=models.PayloadSchemaType.KEYWORD
+        )
+
+def main():
+    """
+    Main function to find near-duplicate questions in the vector store.
+    Writes a canonical-answer report and optionally marks duplicates in the payload.
+    """
+    parser = argparse.ArgumentParser(description='Cluster near-duplicate questions in the Question and Answer collection')
+    parser.add_argument('--threshold', type=float, default=0.93,
+                       help='Cosine similarity above which two questions are treated as duplicates')
+    parser.add_argument('--report', type=str, default='./duplicate_report.json',
+                       help='Path the canonical-answer report is written to')
+    parser.add_argument('--mark', action='store_true',
+                       help='Write cluster_id and is_duplicate into the payload of every point')
+    parser.add_argument('--tenant', type=str, default=None,
+                       help='Tenant whose questions are clustered (DEFAULT_TENANT if omitted)')
+    parser.add_argument('--num_tables', type=int, default=16,
+                       help='LSH hash tables (more tables, better recall, more comparisons)')
+    parser.add_argument('--num_bits', type=int, default=12,
+                       help='Hyperplanes per table (more bits, smaller buckets, lower recall)')
+    args = parser.parse_args()
+
+    try:
+        tenant = resolve_tenant(settings, args.tenant)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    finder = NearDuplicateFinder(tenant=tenant, threshold=args.threshold,
+                                 num_tables=args.num_tables, num_bits=args.num_bits)
+    vectors, ids, rows = finder.fetch_vectors()
+    if not ids:
+        print("No points found in the collection")
+        return
+
+    clusters = finder.cluster(vectors)
+    report = finder.build_report(clusters, ids, rows)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=4)
+    print(f"{report['clusters']} cluster(s), {report['duplicate_points']} duplicate point(s), "
+          f"{report['divergent_clusters']} with diverging answers. Report written to {args.report}")
+
+    if args.mark:
+        finder.mark_duplicates(clusters, ids, rows)
+        print(f"Marked {len(ids)} point(s) with cluster_id")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+# evaluate.py
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from llama_index.core import Document, PromptTemplate
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode, NodeWithScore
+from llama_index.core.utils import get_tokenizer
+from llama_index.llms.openai import OpenAI
+from llama_index.embeddings.openai import OpenAIEmbedding
+from llama_index.postprocessor.cohere_rerank import CohereRerank
+
+from app.config import settings
+from app.prompt import qa_prompt_tmpl_str, general_qa_prompt_tmpl_str, with_company_name
+from app.services.grouped_retriever import mmr_select
+from ragbuilder import QARagBuilder
+
+# Parameters swept for each target and the settings they are written to
+TARGET_SETTINGS = {
+    "query": {
+        "top_k": "QUERY_CANDIDATE_GROUPS",
+        "similarity_cutoff": "QUERY_SIMILARITY_CUTOFF",
+        "top_n": "QUERY_RERANK_TOP_N",
+        "chunk_size": "CHUNK_SIZE",
+        "chunk_overlap": "CHUNK_OVERLAP",
+    },
+    "ask": {
+        "top_k": "ASK_SIMILARITY_TOP_K",
+        "similarity_cutoff": "ASK_SIMILARITY_CUTOFF",
+        "top_n": "ASK_RERANK_TOP_N",
+        "chunk_size": "CHUNK_SIZE",
+        "chunk_overlap": "CHUNK_OVERLAP",
+    },
+}
+
+PARAPHRASE_PROMPT = (
+    "Rewrite the following vendor security questionnaire question {count} different ways, "
+    "as different customers would phrase it. Keep the meaning identical. "
+    "Return one rewrite per line with no numbering or extra text.\n\n"
+    "Question: {question}\n"
+)
+
+class EmbeddingCache:
+    """
+    Disk-backed cache of text embeddings keyed on the model and a hash of the text.
+
+    Sweeping chunk settings re-splits the corpus many times, but most chunks are identical
+    across settings, so each distinct text is only embedded once across all runs.
+
+    Attributes:
+        path: File the cache is persisted to (numpy .npz)
+        embed_model: Embedding model used for cache misses
+    """
+
+    def __init__(self, path: str, embed_model: OpenAIEmbedding):
+        self.path = path
+        self.embed_model = embed_model
+        self._vectors: Dict[str, np.ndarray] = {}
+        if os.path.exists(path):
+            data = np.load(path)
+            self._vectors = dict(zip(data["keys"].tolist(), data["vectors"]))
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.embed_model.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """
+        Returns L2-normalized embeddings for the texts, embedding only cache misses.
+
+        Args:
+            texts (List[str]): Texts to embed
+
+        Returns:
+            np.ndarray: One float32 row per text
+        """
+        keys = [self._key(text) for text in texts]
+        missing = {key: text for key, text in zip(keys, texts) if key not in self._vectors}
+        if missing:
+            print(f"Embedding {len(missing)} uncached text(s)")
+            embeddings = self.embed_model.get_text_embedding_batch(list(missing.values()), show_progress=True)
+            for key, embedding in zip(missing, embeddings):
+                vector = np.asarray(embedding, dtype=np.float32)
+                self._vectors[key] = vector / max(np.linalg.norm(vector), 1e-12)
+        return np.stack([self._vectors[key] for key in keys]) if keys else np.zeros((0, 0), dtype=np.float32)
+
+    def save(self):
+        # Nothing embedded yet (e.g. the run failed before the first embedding call)
+        if not self._vectors:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        keys = list(self._vectors)
+        np.savez(self.path, keys=np.asarray(keys), vectors=np.stack([self._vectors[key] for key in keys]))
+
+class RerankCache:
+    """
+    Disk-backed cache of Cohere relevance scores and call latency per (query, candidate set).
+
+    Scores for the full candidate list are stored, so every top_n can be evaluated from a
+    single rerank call.
+    """
+
+    def __init__(self, path: str, reranker: Optional[CohereRerank]):
+        self.path = path
+        self.reranker = reranker
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                self._entries = json.load(f)
+
+    def scores(self, query: str, nodes: List[BaseNode]) -> Tuple[List[float], float]:
+        """
+        Returns the relevance score of each node for the query and the rerank latency in ms.
+        """
+        # Node ids change every time the corpus is split, so key on the text Cohere sees
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in nodes]
+        key = hashlib.sha256("\0".join([query] + texts).encode("utf-8")).hexdigest()
+        if key not in self._entries:
+            self.reranker.top_n = len(nodes)
+            start = time.perf_counter()
+            ranked = self.reranker.postprocess_nodes([NodeWithScore(node=node, score=0.0) for node in nodes], query_str=query)
+            latency_ms = (time.perf_counter() - start) * 1000
+            by_id = {item.node.node_id: item.score for item in ranked}
+            self._entries[key] = {"scores": [by_id.get(node.node_id, 0.0) for node in nodes], "latency_ms": latency_ms}
+        entry = self._entries[key]
+        return entry["scores"], entry["latency_ms"]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self._entries, f)
+
+def build_query_set(question_answers: List[Dict[str, Any]], llm: OpenAI, path: str,
+                    sample: int, paraphrases: int, seed: int = 42) -> List[Dict[str, str]]:
+    """
+    Builds (or loads) the labelled query set: LLM paraphrases of sampled questionnaire rows.
+
+    The paraphrases are held out of the index, which only contains the original questions,
+    and each is labelled with the cluster_id of the row it was written from.
+
+    Args:
+        question_answers (List[Dict[str, Any]]): Loaded QA JSON documents
+        llm (OpenAI): Model used to write paraphrases
+        path (str): File the query set is cached in
+        sample (int): Number of rows to paraphrase
+        paraphrases (int): Paraphrases per row
+        seed (int): Sampling seed
+
+    Returns:
+        List[Dict[str, str]]: {"query", "cluster_id", "document_name", "row_id"} per query
+    """
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+    rows = [
+        (document.get("document_name", ""), row)
+        for document in question_answers
+        for row in document.get("data", [])
+        if row.get("question")
+    ]
+    random.Random(seed).shuffle(rows)
+
+    queries = []
+    prompt = PromptTemplate(PARAPHRASE_PROMPT)
+    for document_name, row in rows[:sample]:
+        text = llm.complete(prompt.format(count=paraphrases, question=row["question"])).text
+        for line in [line.strip(" -*\t") for line in text.splitlines() if line.strip()][:paraphrases]:
+            queries.append({
+                "query": line,
+                "cluster_id": QARagBuilder.question_key(row["question"]),
+                "document_name": document_name,
+                "row_id": str(row.get("row_id", "")),
+            })
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(queries, f, indent=4)
+    print(f"Wrote {len(queries)} labelled queries to {path}")
+    return queries
+
+class LocalIndex:
+    """
+    In-memory cosine index over the corpus split with one chunk setting.
+
+    Attributes:
+        nodes: Nodes produced by the splitter
+        vectors: Normalized embeddings, one row per node
+    """
+
+    def __init__(self, documents: List[Document], chunk_size: int, chunk_overlap: int, cache: EmbeddingCache):
+        splitter = SentenceSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+        self.nodes = splitter.get_nodes_from_documents(documents)
+        self.vectors = cache.embed([node.get_content(metadata_mode=MetadataMode.EMBED) for node in self.nodes])
+
+    def search(self, query_vector: np.ndarray, top_k: int, grouped: bool) -> List[Tuple[int, float]]:
+        """
+        Returns the top_k (node index, score) pairs, optionally keeping only the best hit per cluster_id.
+        """
+        scores = self.vectors @ query_vector
+        order = np.argsort(-scores)
+        results, seen = [], set()
+        for index in order:
+            if grouped:
+                cluster_id = self.nodes[index].metadata.get("cluster_id")
+                if cluster_id in seen:
+                    continue
+                seen.add(cluster_id)
+            results.append((int(index), float(scores[index])))
+            if len(results) == top_k:
+                break
+        return results
+
+def evaluate_config(index: LocalIndex, queries: List[Dict[str, str]], query_vectors: np.ndarray,
+                    target: str, top_k: int, similarity_cutoff: float, top_n: int,
+                    reranks: Optional[RerankCache], prompt_template: str, tokenizer) -> Dict[str, float]:
+    """
+    Runs every labelled query through the retrieval pipeline of the target endpoint.
+
+    /query: grouped search -> MMR -> similarity cutoff -> rerank to top_n.
+    /ask:   plain search -> similarity cutoff -> rerank to top_n.
+
+    Returns:
+        Dict[str, float]: recall@top_n, MRR, candidate recall, mean latency and mean LLM prompt tokens
+    """
+    hits, candidate_hits, reciprocal_ranks, latencies, tokens = 0, 0, [], [], []
+    template = PromptTemplate(prompt_template)
+
+    for query, query_vector in zip(queries, query_vectors):
+        start = time.perf_counter()
+        candidates = index.search(query_vector, top_k=top_k, grouped=(target == "query"))
+
+        if target == "query" and candidates:
+            selected = mmr_select(query_vector, index.vectors[[i for i, _ in candidates]],
+                                  top_k=settings.QUERY_MMR_TOP_K, lambda_mult=settings.QUERY_MMR_LAMBDA)
+            candidates = [candidates[i] for i in selected]
+
+        candidates = [(i, score) for i, score in candidates if score >= similarity_cutoff]
+        latency_ms = (time.perf_counter() - start) * 1000
+
+        if reranks is not None and candidates:
+            scores, rerank_ms = reranks.scores(query["query"], [index.nodes[i] for i, _ in candidates])
+            latency_ms += rerank_ms
+            candidates = [candidate for _, candidate in sorted(zip(scores, candidates), key=lambda item: -item[0])]
+        final = candidates[:top_n]
+        latencies.append(latency_ms)
+
+        candidate_clusters = [index.nodes[i].metadata.get("cluster_id") for i, _ in candidates]
+        final_clusters = candidate_clusters[:top_n]
+        candidate_hits += query["cluster_id"] in candidate_clusters
+        if query["cluster_id"] in final_clusters:
+            hits += 1
+            reciprocal_ranks.append(1 / (final_clusters.index(query["cluster_id"]) + 1))
+        else:
+            reciprocal_ranks.append(0.0)
+
+        context = "\n\n".join(index.nodes[i].get_content(metadata_mode=MetadataMode.LLM) for i, _ in final)
+        tokens.append(len(tokenizer(template.format(context_str=context, query_str=query["query"]))))
+
+    total = max(len(queries), 1)
+    return {
+        "recall": hits / total,
+        "mrr": float(np.mean(reciprocal_ranks)) if reciprocal_ranks else 0.0,
+        "candidate_recall": candidate_hits / total,
+        "latency_ms": float(np.mean(latencies)) if latencies else 0.0,
+        "llm_tokens": float(np.mean(tokens)) if tokens else 0.0,
+    }
+
+def choose_config(results: List[Dict[str, Any]], recall_tolerance: float) -> Dict[str, Any]:
+    """
+    Picks the cheapest configuration whose recall is within tolerance of the best.
+
+    Among configurations close to the best recall, fewer LLM tokens win, then lower
+    latency, then higher MRR.
+    """
+    best_recall = max(result["recall"] for result in results)
+    eligible = [result for result in results if result["recall"] >= best_recall - recall_tolerance]
+    return min(eligible, key=lambda result: (round(result["llm_tokens"]), round(result["latency_ms"], 1), -result["mrr"]))
+
+def write_env(path: str, values: Dict[str, Any]):
+    """
+    Writes settings into a .env file, replacing existing keys and keeping everything else.
+    """
+    lines = []
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+
+    remaining = dict(values)
+    for index, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if key in remaining:
+            lines[index] = f"{key}={remaining.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in remaining.items())
+
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(",") if item]
+
+def main():
+    """
+    Sweeps retrieval parameters against a labelled query set and writes the best values to settings.
+    """
+    parser = argparse.ArgumentParser(description='Evaluate and tune retrieval parameters offline')
+    parser.add_argument('--qa_directory', type=str, default='./app/data/questions_and_answers',
+                       help='Path to the directory containing Question and Answer JSON files')
+    parser.add_argument('--cache_directory', type=str, default='./eval_cache',
+                       help='Directory for the query set, embedding cache, rerank cache and results')
+    parser.add_argument('--target', choices=list(TARGET_SETTINGS), default='query',
+                       help='Endpoint whose retrieval pipeline is tuned')
+    parser.add_argument('--sample', type=int, default=200, help='Rows paraphrased into labelled queries')
+    parser.add_argument('--paraphrases', type=int, default=2, help='Paraphrases per sampled row')
+    parser.add_argument('--top_k', type=str, default='5,7,10,15,25')
+    parser.add_argument('--similarity_cutoff', type=str, default='0.3,0.45,0.6')
+    parser.add_argument('--top_n', type=str, default='2,3,5,7')
+    parser.add_argument('--chunks', type=str, default='2048:256,1024:128,512:64',
+                       help='Comma-separated chunk_size:chunk_overlap pairs')
+    parser.add_argument('--no_rerank', action='store_true', help='Skip Cohere reranking (vector order only)')
+    parser.add_argument('--recall_tolerance', type=float, default=0.01,
+                       help='Recall drop accepted in exchange for fewer tokens or lower latency')
+    parser.add_argument('--write_env', type=str, default=None,
+                       help='Write the chosen values into this .env file (e.g. .env)')
+    args = parser.parse_args()
+
+    llm = OpenAI(model=settings.OPENAI_LLM_MODEL, temperature=0.7, api_key=settings.OPENAI_API_KEY)
+    embed_model = OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+    reranker = None if args.no_rerank else CohereRerank(api_key=settings.COHERE_API_KEY)
+
+    embeddings = EmbeddingCache(os.path.join(args.cache_directory, "embeddings.npz"), embed_model)
+    reranks = None if args.no_rerank else RerankCache(os.path.join(args.cache_directory, "reranks.json"), reranker)
+
+    question_answers = QARagBuilder.get_question_answers(qa_directory=args.qa_directory)
+    documents = QARagBuilder.load_data(text_list=question_answers)
+    queries = build_query_set(question_answers, llm, os.path.join(args.cache_directory, "queries.json"),
+                              sample=args.sample, paraphrases=args.paraphrases)
+    query_vectors = embeddings.embed([query["query"] for query in queries])
+
+    prompt_template = with_company_name(qa_prompt_tmpl_str, settings.COMPANY_NAME) if args.target == "query" else general_qa_prompt_tmpl_str
+    tokenizer = get_tokenizer()
+    chunks = [tuple(int(part) for part in chunk.split(":")) for chunk in args.chunks.split(",")]
+
+    # /query only reranks the QUERY_MMR_TOP_K candidates MMR keeps, so a larger top_n
+    # would just repeat the configuration at the cap
+    top_n_grid = parse_list(args.top_n, int)
+    if args.target == "query":
+        top_n_grid = sorted({min(top_n, settings.QUERY_MMR_TOP_K) for top_n in top_n_grid})
+
+    results = []
+    try:
+        for chunk_size, chunk_overlap in chunks:
+            index = LocalIndex(documents, chunk_size, chunk_overlap, embeddings)
+            for top_k, cutoff, top_n in itertools.product(parse_list(args.top_k, int),
+                                                          parse_list(args.similarity_cutoff, float),
+                                                          top_n_grid):
+                if top_n > top_k:
+                    continue
+                metrics = evaluate_config(index, queries, query_vectors, args.target, top_k, cutoff, top_n,
+                                          reranks, prompt_template, tokenizer)
+                result = {"top_k": top_k, "similarity_cutoff": cutoff, "top_n": top_n,
+                          "chunk_size": chunk_size, "chunk_overlap": chunk_overlap, **metrics}
+                results.append(result)
+                print(f"chunk={chunk_size}:{chunk_overlap} top_k={top_k:<3} cutoff={cutoff:<5} top_n={top_n:<2} "
+                      f"recall@n={metrics['recall']:.3f} mrr={metrics['mrr']:.3f} "
+                      f"latency={metrics['latency_ms']:.1f}ms tokens={metrics['llm_tokens']:.0f}")
+    finally:
+        embeddings.save()
+        if reranks is not None:
+            reranks.save()
+
+    if not results:
+        print("No configurations evaluated")
+        return
+
+    with open(os.path.join(args.cache_directory, f"results_{args.target}.json"), "w") as f:
+        json.dump(results, f, indent=4)
+
+    chosen = choose_config(results, args.recall_tolerance)
+    values = {setting: chosen[param] for param, setting in TARGET_SETTINGS[args.target].items()}
+    print(f"Chosen configuration: {values} (recall@n={chosen['recall']:.3f}, mrr={chosen['mrr']:.3f}, "
+          f"tokens={chosen['llm_tokens']:.0f})")
+
+    if args.write_env:
+        write_env(args.write_env, values)
+        print(f"Wrote chosen values to {args.write_env}")
+
+if __name__ == "__main__":
+    main()
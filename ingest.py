@@ -0,0 +1,428 @@
+# ingest.py
+import os
+import re
+import json
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.services.tenancy import resolve_tenant, tenant_conversion_cache, tenant_qa_directory
+
+# File types handled by each converter. Spreadsheets go through markitdown, which renders
+# every sheet as a markdown table; paginated documents go through docling's layout model.
+MARKITDOWN_EXTENSIONS = {'.xlsx', '.xls', '.csv'}
+DOCLING_EXTENSIONS = {'.docx', '.pdf'}
+SUPPORTED_EXTENSIONS = MARKITDOWN_EXTENSIONS | DOCLING_EXTENSIONS
+
+# Header keywords used to map questionnaire columns onto the QA schema
+COLUMN_KEYWORDS = {
+    'question': ('question', 'query', 'requirement'),
+    'answer': ('answer', 'response', 'vendor response'),
+    'product': ('product',),
+    'row_id': ('row_id', 'row id', 'id', '#', 'no.', 'number', 'ref', 'reference'),
+}
+
+# Number of leading rows searched for the header, since exported questionnaires often
+# start with a title or instructions row that markitdown renders as the table header
+HEADER_SCAN_ROWS = 5
+
+# Cell renderings of a missing value: markitdown writes empty spreadsheet cells as "NaN"
+# and null objects as "None". A lowercase "none" is kept, as it is a legitimate answer.
+MISSING_VALUES = {'', 'nan', 'NaN', 'None', 'null', 'NULL'}
+
+# Part of every conversion cache key, bumped whenever the converted document shape changes
+# so entries written by an older converter are converted again instead of reused
+CONVERSION_FORMAT = 2
+
+# Converters are expensive to build (docling loads its models), so each worker process
+# creates them once and reuses them for every file it is handed.
+_markitdown = None
+_docling = None
+
+def file_hash(file_path: str, block_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 digest of a file's contents.
+
+    Args:
+        file_path (str): Path to the file to hash
+        block_size (int): Number of bytes read per iteration
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _to_markdown(file_path: str) -> str:
+    """
+    Converts a questionnaire file to markdown using the converter suited to its type.
+
+    Args:
+        file_path (str): Path to the source file
+
+    Returns:
+        str: Markdown rendering of the file
+    """
+    global _markitdown, _docling
+
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension in MARKITDOWN_EXTENSIONS:
+        if _markitdown is None:
+            from markitdown import MarkItDown
+            _markitdown = MarkItDown()
+        return _markitdown.convert(file_path).text_content
+
+    if _docling is None:
+        from docling.document_converter import DocumentConverter
+        _docling = DocumentConverter()
+    return _docling.convert(file_path).document.export_to_markdown()
+
+def _split_row(line: str) -> List[str]:
+    """
+    Splits a markdown table row into its stripped cell values.
+
+    Only unescaped pipes separate cells, so a "\\|" inside a cell is kept as a literal "|".
+    """
+    line = line.strip()
+    cells = re.split(r'(?<!\\)\|', line)
+    # Drop the empty strings produced by the leading and trailing pipes
+    if line.startswith('|'):
+        cells = cells[1:]
+    if re.search(r'(?<!\\)\|$', line) and cells:
+        cells = cells[:-1]
+    return [cell.strip().replace('\\|', '|') for cell in cells]
+
+def _is_separator(cells: List[str]) -> bool:
+    """
+    Checks whether a markdown table row is the header separator (e.g. | --- | :-: |).
+    """
+    return all(re.fullmatch(r':?-{3,}:?', cell) for cell in cells if cell)
+
+def parse_markdown_tables(markdown: str) -> List[List[List[str]]]:
+    """
+    Extracts every pipe table from a markdown document.
+
+    Args:
+        markdown (str): Markdown text produced by markitdown or docling
+
+    Returns:
+        List[List[List[str]]]: One list of rows per table, the first row being the header
+    """
+    tables = []
+    current = []
+    for line in markdown.splitlines():
+        if line.strip().startswith('|'):
+            cells = _split_row(line)
+            if not _is_separator(cells):
+                current.append(cells)
+        elif current:
+            tables.append(current)
+            current = []
+    if current:
+        tables.append(current)
+    return tables
+
+def _match_columns(header: List[str]) -> Dict[str, int]:
+    """
+    Maps QA schema fields to column indexes based on the table header.
+
+    Args:
+        header (List[str]): Header cells of a table
+
+    Returns:
+        Dict[str, int]: Column index for each schema field found in the header
+    """
+    names = [" ".join(cell.lower().split()) for cell in header]
+    matches = {
+        field: [_keyword_match(name, keywords) for name in names]
+        for field, keywords in COLUMN_KEYWORDS.items()
+    }
+
+    # Rank every (field, column) match: exact header names first, then whole-word matches
+    # that only fit one field, then whole-word matches shared with another field (e.g.
+    # "Question ID", which holds "question" and "id"). Ties go to the leftmost column.
+    candidates = []
+    for field, field_matches in matches.items():
+        for index, match in enumerate(field_matches):
+            if match == 2:
+                candidates.append((0, index, field))
+            elif match == 1:
+                shared = any(matches[other][index] for other in matches if other != field)
+                candidates.append((2 if shared else 1, index, field))
+
+    columns = {}
+    for _, index, field in sorted(candidates):
+        if field not in columns and index not in columns.values():
+            columns[field] = index
+    return columns
+
+def _keyword_match(name: str, keywords: Tuple[str, ...]) -> int:
+    """
+    Returns 2 if the header name is one of the keywords, 1 if it contains one as a whole
+    word (plurals included), 0 otherwise.
+    """
+    if name in keywords:
+        return 2
+    for keyword in keywords:
+        if re.search(r"(?<![a-z0-9])" + re.escape(keyword) + r"(?:s|es)?(?![a-z0-9])", name):
+            return 1
+    return 0
+
+def _find_header(table: List[List[str]]) -> Tuple[int, Dict[str, int]]:
+    """
+    Finds the header among the first HEADER_SCAN_ROWS rows of a table.
+
+    Returns:
+        Tuple[int, Dict[str, int]]: Index of the first row holding both a question and an
+        answer column, with its column mapping, or (-1, {}) if there is none
+    """
+    for index, row in enumerate(table[:HEADER_SCAN_ROWS]):
+        columns = _match_columns(row)
+        if 'question' in columns and 'answer' in columns:
+            return index, columns
+    return -1, {}
+
+def tables_to_rows(tables: List[List[List[str]]], default_product: str) -> List[Dict[str, Any]]:
+    """
+    Converts parsed tables into QA rows, skipping tables without question and answer columns
+    and rows whose question or answer is missing (empty, NaN or None).
+
+    Args:
+        tables (List[List[List[str]]]): Tables returned by parse_markdown_tables
+        default_product (str): Product assigned when the table has no product column
+
+    Returns:
+        List[Dict[str, Any]]: Rows in the {row_id, question, answer, product} shape
+    """
+    rows = []
+    for table in tables:
+        header_index, columns = _find_header(table)
+        if header_index < 0:
+            continue
+
+        for cells in table[header_index + 1:]:
+            def cell(field: str) -> str:
+                index = columns.get(field)
+                value = cells[index] if index is not None and index < len(cells) else ''
+                return '' if value in MISSING_VALUES else value
+
+            question = cell('question')
+            answer = cell('answer')
+            if not question or not answer:
+                continue
+
+            rows.append({
+                'row_id': cell('row_id') or f"R{len(rows) + 1:03d}",
+                'question': question,
+                'answer': answer,
+                'product': cell('product') or default_product,
+            })
+    return rows
+
+def convert_file(file_path: str, default_product: str) -> Dict[str, Any]:
+    """
+    Converts a single questionnaire file into the QA JSON document shape.
+
+    Runs inside a worker process, so it only takes and returns picklable values.
+
+    Args:
+        file_path (str): Path to the XLSX/CSV/DOCX/PDF questionnaire
+        default_product (str): Product assigned when the file has no product column
+
+    Returns:
+        Dict[str, Any]: {"document_name": ..., "data": [...]}
+    """
+    markdown = _to_markdown(file_path)
+    # The extension stays in the name so foo.xlsx and foo.pdf are stored as separate documents
+    document_name = os.path.basename(file_path)
+    return {
+        'document_name': document_name,
+        'data': tables_to_rows(parse_markdown_tables(markdown), default_product),
+    }
+
+class QuestionnaireConverter:
+    """
+    Converts raw questionnaire files into QA JSON documents in parallel, with a conversion
+    cache keyed on the SHA-256 of each source file and the default product.
+
+    Converted documents are written to the QA directory read by QARagBuilder. A copy is
+    kept in the cache directory once record_ingested confirms the document reached the
+    vector store, so unchanged files are never converted or ingested twice, while a file
+    whose ingestion failed is picked up again on the next run.
+
+    Attributes:
+        output_directory: Directory the converted QA JSON files are written to
+        cache_directory: Directory holding cached conversions, one <hash>.json per source file
+        max_workers: Number of worker processes used for conversion
+        default_product: Product assigned to rows from files without a product column
+    """
+
+    def __init__(self,
+                 output_directory: str = settings.QA_DIRECTORY_PATH,
+                 cache_directory: str = settings.CONVERSION_CACHE_PATH,
+                 max_workers: Optional[int] = None,
+                 default_product: str = 'None specified'):
+        """
+        Initializes the converter and creates the output and cache directories.
+
+        Args:
+            output_directory (str): Directory for converted QA JSON files
+            cache_directory (str): Directory for the conversion cache
+            max_workers (Optional[int]): Worker processes; defaults to the CPU count
+            default_product (str): Product used when a file has no product column
+        """
+        self.output_directory = output_directory
+        self.cache_directory = cache_directory
+        self.max_workers = max_workers
+        self.default_product = default_product
+
+        # Cache keys of the documents converted by this run, until they are recorded as ingested
+        self.pending_cache_keys: Dict[str, str] = {}
+
+        os.makedirs(self.output_directory, exist_ok=True)
+        os.makedirs(self.cache_directory, exist_ok=True)
+
+    def _cache_key(self, file_path: str) -> str:
+        # The default product is written into rows without a product column, so a run with
+        # another --product must not reuse the cached rows
+        key = f"{CONVERSION_FORMAT}:{file_hash(file_path)}:{self.default_product}"
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_directory, f"{key}.json")
+
+    def _write_json(self, path: str, data: Dict[str, Any]):
+        # Write to a temporary file first so an interrupted run never leaves a truncated cache entry
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def find_source_files(self, source_directory: str) -> List[str]:
+        """
+        Lists the supported questionnaire files in a directory.
+
+        Args:
+            source_directory (str): Directory containing raw questionnaires
+
+        Returns:
+            List[str]: Sorted paths of the supported files
+        """
+        try:
+            filenames = sorted(os.listdir(source_directory))
+        except FileNotFoundError as e:
+            print(f"{e}")
+            return []
+
+        return [
+            os.path.join(source_directory, filename)
+            for filename in filenames
+            if os.path.splitext(filename)[1].lower() in SUPPORTED_EXTENSIONS
+            and not filename.startswith('~$')
+        ]
+
+    def convert_directory(self, source_directory: str) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Converts every supported file in a directory, skipping files whose cache key is already cached.
+
+        The cache is not written here: pass the documents that were ingested successfully to
+        record_ingested.
+
+        Args:
+            source_directory (str): Directory containing raw questionnaires
+
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: The newly converted documents and
+            the unchanged documents loaded from the cache
+        """
+        converted, unchanged, pending = [], [], {}
+
+        for file_path in self.find_source_files(source_directory):
+            key = self._cache_key(file_path)
+            cache_path = self._cache_path(key)
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r') as f:
+                    unchanged.append(json.load(f))
+            else:
+                pending[file_path] = key
+
+        print(f"{len(unchanged)} unchanged file(s) skipped, {len(pending)} file(s) to convert")
+        if not pending:
+            return converted, unchanged
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(convert_file, file_path, self.default_product): file_path
+                for file_path in pending
+            }
+            for future in as_completed(futures):
+                file_path = futures[future]
+                try:
+                    document = future.result()
+                except Exception as e:
+                    print(f"Failed to convert {file_path}: {str(e)}")
+                    continue
+
+                if not document['data']:
+                    print(f"No question/answer table found in {file_path}")
+                    continue
+
+                self.pending_cache_keys[document['document_name']] = pending[file_path]
+                self._write_json(os.path.join(self.output_directory, f"{document['document_name']}.json"), document)
+                print(f"Converted {file_path} ({len(document['data'])} rows)")
+                converted.append(document)
+
+        return converted, unchanged
+
+    def record_ingested(self, documents: List[Dict[str, Any]]):
+        """
+        Adds converted documents to the cache once they have been written to the vector store.
+
+        Args:
+            documents (List[Dict[str, Any]]): Documents returned by convert_directory; the
+                                              unchanged ones are already cached and skipped
+        """
+        for document in documents:
+            key = self.pending_cache_keys.pop(document['document_name'], None)
+            if key is not None:
+                self._write_json(self._cache_path(key), document)
+
+def main():
+    """
+    Converts a directory of raw questionnaires into QA JSON files.
+
+    Nothing is ingested here, so the conversion cache is only read: the files are recorded
+    once ragbuilder.py --source_directory has written them to the vector store.
+    """
+    parser = argparse.ArgumentParser(description='Convert XLSX/CSV/DOCX/PDF questionnaires into Question and Answer JSON files')
+    parser.add_argument('--source_directory', type=str, required=True,
+                       help='Path to the directory containing raw questionnaire files')
+    parser.add_argument('--qa_directory', type=str, default=None,
+                       help='Path to the directory the converted JSON files are written to '
+                            '(defaults to the tenant\'s directory under QA_DIRECTORY_PATH)')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Number of conversion processes (defaults to the CPU count)')
+    parser.add_argument('--product', type=str, default='None specified',
+                       help='Product assigned to rows from files without a product column')
+    parser.add_argument('--tenant', type=str, default=None,
+                       help='Tenant the questionnaires belong to (DEFAULT_TENANT if omitted)')
+    args = parser.parse_args()
+
+    try:
+        tenant = resolve_tenant(settings, args.tenant)
+    except ValueError as e:
+        raise SystemExit(str(e))
+
+    converter = QuestionnaireConverter(output_directory=args.qa_directory or tenant_qa_directory(settings, tenant),
+                                       cache_directory=tenant_conversion_cache(settings, tenant),
+                                       max_workers=args.workers,
+                                       default_product=args.product)
+    converter.convert_directory(args.source_directory)
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,6 @@
 # ragbuilder.py
-import os
-import json
 import argparse
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 from llama_index.core import (
     VectorStoreIndex, 
     Document, 
@@ -14,9 +12,34 @@ from llama_index.core.storage.storage_context import StorageContext
 from llama_index.llms.openai import OpenAI
 from llama_index.embeddings.openai import OpenAIEmbedding
 from llama_index.vector_stores.qdrant import QdrantVectorStore
-import qdrant_client
+from qdrant_client import models
 
 from app.config import settings
+from app.services.qdrant_connection import create_qdrant_client
+from app.services.qa_documents import (
+    delete_stale_document_points,
+    ensure_document_index,
+    previous_document_payloads,
+    qa_documents,
+    question_key,
+    read_qa_directory,
+    restore_document_payloads,
+)
+from app.services.tenancy import (
+    claim_untagged_points,
+    ensure_tenant_index,
+    resolve_tenant,
+    tenant_collection,
+    tenant_company_name,
+    tenant_conditions,
+    tenant_conversion_cache,
+    tenant_payload,
+    tenant_qa_directory,
+)
+from ingest import QuestionnaireConverter
+from collection_aliases import CollectionAliasManager
+from app.prompt import qa_chat_prompt
+from app.services.suggested_answers import SuggestedAnswerGenerator
 
 class QARagBuilder:
     """
@@ -27,33 +50,51 @@ class QARagBuilder:
     including text splitting, embedding generation, and vector storage management.
 
     Attributes:
+        tenant: Tenant whose data is built
         client: A Qdrant client instance for vector database operations
+        collection_name: Name of the collection (or alias) nodes are written to
         vector_store: A QdrantVectorStore instance for managing vector storage
         storage_context: A StorageContext instance for managing storage operations
         text_splitter: A SentenceSplitter instance for chunking text into appropriate sizes
     """
     
-    def __init__(self):        
+    def __init__(self, tenant: Optional[str] = None):        
         """
         Initializes the QARagBuilder with OpenAI models and Qdrant vector store configurations.
         Sets up the necessary components including LLM, embedding model, vector store, and text splitter.
+
+        Args:
+            tenant (Optional[str]): Tenant whose collection (or payload partition) is built.
+                                    Defaults to DEFAULT_TENANT.
         """
+        self.tenant = tenant or settings.DEFAULT_TENANT
         Settings.llm = OpenAI(model=settings.OPENAI_LLM_MODEL, temperature=settings.TEMPERATURE, api_key=settings.OPENAI_API_KEY)
         Settings.embed_model = OpenAIEmbedding(model=settings.OPENAI_EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY, num_workers=8)
 
         # Try connecting to Qdrant with different configurations
         self.client = self._setup_qdrant_client()
         
-        self.vector_store = QdrantVectorStore(collection_name=settings.QDRANT_VECTOR_COLLECTION, 
+        self.use_collection(tenant_collection(settings, self.tenant))
+        self.text_splitter = SentenceSplitter(chunk_size=settings.CHUNK_SIZE, chunk_overlap=settings.CHUNK_OVERLAP)
+
+    def use_collection(self, collection_name: str):
+        """
+        Points the vector store at a collection (or alias) that subsequent writes go to.
+
+        Args:
+            collection_name (str): Name of the target collection
+        """
+        self.collection_name = collection_name
+        self.vector_store = QdrantVectorStore(collection_name=collection_name, 
                                             client=self.client,
                                             enable_hybrid=False)
         
         self.storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
-        self.text_splitter = SentenceSplitter(chunk_size=2048, chunk_overlap=256)
 
     def _setup_qdrant_client(self):
         """
-        Attempts to establish a connection to the Qdrant server using multiple fallback configurations.
+        Attempts to establish a connection to Qdrant for the configured QDRANT_MODE, trying
+        multiple fallback servers in http/grpc mode.
 
         Returns:
             qdrant_client.QdrantClient: A connected Qdrant client instance
@@ -61,45 +102,115 @@ class QARagBuilder:
         Raises:
             ConnectionError: If unable to connect to Qdrant with any of the configurations
         """
-        # List of possible Qdrant configurations to try
-        configs = [
-            {"url": settings.QDRANT_SERVER, "port": settings.QDRANT_PORT},
-            {"url": "localhost", "port": settings.QDRANT_PORT},  # Local fallback
-            {"url": "127.0.0.1", "port": settings.QDRANT_PORT},  # Alternative local fallback
+        # The embedded store has no server to fall back from
+        if settings.QDRANT_MODE == "local":
+            print(f"Using embedded Qdrant at {settings.QDRANT_STORAGE_PATH}")
+            return create_qdrant_client(settings)
+
+        # List of possible Qdrant servers to try
+        urls = [
+            settings.QDRANT_SERVER,
+            "localhost",  # Local fallback
+            "127.0.0.1",  # Alternative local fallback
         ]
 
         last_exception = None
-        for config in configs:
+        for url in urls:
             try:
-                client = qdrant_client.QdrantClient(**config)
+                client = create_qdrant_client(settings, url=url)
                 # test the connection by making a simple API call
                 client.get_collections()
-                print(f"Successfully connected to Qdrant at {config['url']}:{config['port']}")
+                print(f"Successfully connected to Qdrant ({settings.QDRANT_MODE}) at {url}:{settings.QDRANT_PORT}")
                 return client
             except Exception as e:
                 last_exception = e
-                print(f"Failed to connect to Qdrant at {config['url']}:{config['port']}: {str(e)}")
+                print(f"Failed to connect to Qdrant ({settings.QDRANT_MODE}) at {url}:{settings.QDRANT_PORT}: {str(e)}")
                 continue
 
         raise ConnectionError(f"Could not connect to Qdrant with any configuration. Last error: {str(last_exception)}")
 
-    def write_to_vectordb(self, nodes: List[BaseNode]):
+    def write_to_vectordb(self, nodes: List[BaseNode], payload_source: Optional[str] = None) -> bool:
         """
         Writes the provided nodes to the vector database using the configured embedding model.
 
+        Each document's previously stored points (for this tenant) are deleted once its new
+        nodes are written, so re-ingesting an edited questionnaire replaces its rows. Rows
+        whose text is unchanged keep their dedupe.py --mark cluster and precomputed suggestion.
+
         Args:
             nodes (List[BaseNode]): A list of nodes to be written to the vector database
+            payload_source (Optional[str]): Collection the carried-over payload is read from.
+                                            Defaults to the target collection; a blue/green
+                                            rebuild passes the collection behind the alias.
 
-        Raises:
-            Exception: If writing to the vector database fails
+        Returns:
+            bool: True if the nodes were written, False if writing to the vector database failed
         """
         try:
+            conditions = tenant_conditions(settings, self.tenant)
+            document_nodes = {}
+            for node in nodes:
+                document_nodes.setdefault(node.metadata.get('document_name', ''), []).append(node)
+            payload_source = payload_source or self.collection_name
+            previous = {
+                document_name: previous_document_payloads(self.client, payload_source, document_name, conditions)
+                for document_name in document_nodes
+            }
+            
             VectorStoreIndex(nodes=nodes,
                            embed_model=Settings.embed_model,
                            storage_context=self.storage_context,
                            show_progress=True)
+            
+            # Carry clusters and suggestions over, then drop the rows left over from earlier
+            # ingestions of the same documents
+            for document_name, written in document_nodes.items():
+                restore_document_payloads(self.client, self.collection_name, written, previous[document_name])
+                delete_stale_document_points(self.client, self.collection_name, document_name,
+                                             [node.node_id for node in written], conditions=conditions)
+            
+            # Index the cluster key so grouped search in /query stays fast, and the document
+            # name for per-document re-ingestion and exports
+            self.client.create_payload_index(
+                collection_name=self.collection_name,
+                field_name="cluster_id",
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+            ensure_document_index(self.client, self.collection_name)
+            
+            # Tenants sharing a collection are partitioned by the tenant index
+            if tenant_payload(settings, self.tenant):
+                ensure_tenant_index(self.client, self.collection_name)
+            return True
         except Exception as e:
             print(f"Failed to write nodes to vector db: {str(e)}")
+            return False
+
+    def generate_suggested_answers(self, max_workers: int = 8, previous_collection: str = None):
+        """
+        Precomputes the /query suggested answer for every row of the target collection.
+
+        Only rows whose question, answer, model or prompt changed since their last suggestion
+        are sent to the LLM, so the stage can be interrupted and re-run safely. Only the
+        tenant's rows are touched.
+
+        Args:
+            max_workers (int): Number of concurrent LLM requests
+            previous_collection (str): Collection whose suggestions are reused by content hash
+        """
+        conditions = tenant_conditions(settings, self.tenant)
+        generator = SuggestedAnswerGenerator(client=self.client,
+                                             collection_name=self.collection_name,
+                                             llm=Settings.llm,
+                                             model=settings.OPENAI_LLM_MODEL,
+                                             prompt=qa_chat_prompt(tenant_company_name(settings, self.tenant)),
+                                             max_workers=max_workers,
+                                             previous_collection=previous_collection,
+                                             scroll_filter=models.Filter(must=conditions) if conditions else None)
+        stats = generator.run()
+        print(f"Suggested answers: {stats['generated']} generated, {stats['reused']} reused, "
+              f"{stats['skipped']} up to date, {stats['failed']} failed")
+        print(f"LLM output parsing: {generator.parse_stats.snapshot()}")
 
     def get_semantic_vector(self, text: str) -> List[float]:
         """
@@ -114,7 +225,8 @@ class QARagBuilder:
         embedding = Settings.embed_model.get_text_embedding(text)
         return embedding
     
-    def get_question_answers(self, qa_directory: str) -> List[Dict[str, Any]]:
+    @staticmethod
+    def get_question_answers(qa_directory: str) -> List[Dict[str, Any]]:
         """
         Loads question-answer pairs from JSON files in the specified directory.
 
@@ -124,23 +236,7 @@ class QARagBuilder:
         Returns:
             List[Dict[str, Any]]: A list of dictionaries containing the loaded QA pairs
         """
-        all_data = []
-        try:
-            for filename in os.listdir(qa_directory):
-                if filename.endswith('.json'):
-                    file_path = os.path.join(qa_directory, filename)
-                    try:
-                        with open(file_path, 'r') as f:
-                            data = json.load(f)
-                            all_data.append(data)
-                    except json.JSONDecodeError:
-                        print(f"Error decoding JSON from file: {filename}")
-                    except IOError:
-                        print(f"Error reading file: {filename}")
-        except FileNotFoundError as e:
-            print(f"{e}")
-        
-        return all_data
+        return read_qa_directory(qa_directory)
     
     def split_text_and_create_nodes(self, documents: List[Document]) -> List[BaseNode]:
         """
@@ -164,33 +260,26 @@ class QARagBuilder:
             
         return enriched_nodes
     
-    def load_data(self, text_list: List[Dict[str, Any]]) -> List[Document]:
+    @staticmethod
+    def question_key(question: str) -> str:
+        """
+        Builds a cluster key from the normalized question text (see qa_documents.question_key).
+        """
+        return question_key(question)
+    
+    @staticmethod
+    def load_data(text_list: List[Dict[str, Any]], tenant_metadata: Optional[Dict[str, str]] = None) -> List[Document]:
         """
         Processes a list of text data into Documents with associated metadata.
 
         Args:
             text_list (List[Dict[str, Any]]): A list of dictionaries containing text data and metadata
+            tenant_metadata (Optional[Dict[str, str]]): Tenant partition fields added to every row
 
         Returns:
             List[Document]: A list of Document objects with processed text and metadata
         """
-        documents = []
-        
-        for text in text_list:
-            document_name = text.get('document_name', '')
-            
-            for row in text.get('data', []):
-                question = row.get('question', '')
-                
-                combined_metadata = {'document_name': document_name}
-                
-                for key, value in row.items():
-                    if key != 'question':
-                        combined_metadata[key] = value if isinstance(value, str) else value
-                
-                documents.append(Document(text=question, metadata=combined_metadata))
-        
-        return documents
+        return qa_documents(text_list, tenant_metadata=tenant_metadata)
 
 def main():
     """
@@ -198,19 +287,106 @@ def main():
     Handles command-line arguments and orchestrates the RAG building process.
     """
     parser = argparse.ArgumentParser(description='Process Vendor Question and Answer documents from a specified directory')
-    parser.add_argument('--qa_directory', type=str, 
-                       default='./app/data/questions_and_answers',
-                       help='Path to the directory containing Question and Answer JSON files')
+    parser.add_argument('--qa_directory', type=str, default=None,
+                       help='Path to the directory containing Question and Answer JSON files '
+                            '(defaults to the tenant\'s directory under QA_DIRECTORY_PATH)')
+    parser.add_argument('--source_directory', type=str, default=None,
+                       help='Optional directory of raw XLSX/CSV/DOCX/PDF questionnaires to convert and ingest. '
+                            'Only files that changed since the last conversion are ingested.')
+    parser.add_argument('--workers', type=int, default=None,
+                       help='Number of conversion processes used with --source_directory')
+    parser.add_argument('--blue_green', action='store_true',
+                       help='Rebuild into a new versioned collection and atomically switch the query alias to it once validated')
+    parser.add_argument('--replace_collection', action='store_true',
+                       help='With --blue_green, delete a plain collection holding the alias name (one-time migration)')
+    parser.add_argument('--keep_versions', type=int, default=2,
+                       help='With --blue_green, number of collection versions kept for rollback')
+    parser.add_argument('--suggest', action='store_true',
+                       help='After ingestion, precompute suggested answers for new or changed rows')
+    parser.add_argument('--suggest_only', action='store_true',
+                       help='Only precompute suggested answers for the existing collection, without ingesting')
+    parser.add_argument('--suggest_workers', type=int, default=8,
+                       help='Number of concurrent LLM requests when precomputing suggested answers')
+    parser.add_argument('--tenant', type=str, default=None,
+                       help='Tenant to build (DEFAULT_TENANT if omitted). Other tenants are left untouched.')
+    parser.add_argument('--claim_untagged', action='store_true',
+                       help='With TENANT_MODE=payload, assign points stored before multi-tenancy (no tenant_id) '
+                            'to --tenant and exit. Run once when switching an existing collection to payload mode.')
     args = parser.parse_args()
 
-    rag = QARagBuilder()
+    try:
+        tenant = resolve_tenant(settings, args.tenant)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if args.blue_green and settings.TENANT_MODE == "payload":
+        # A rebuild would replace the shared collection, dropping every other tenant
+        raise SystemExit("--blue_green needs TENANT_MODE=collection, where each tenant has its own collection")
+
+    rag = QARagBuilder(tenant=tenant)
+    qa_directory = args.qa_directory or tenant_qa_directory(settings, tenant)
+    
+    if args.claim_untagged:
+        if settings.TENANT_MODE != "payload":
+            raise SystemExit("--claim_untagged only applies to TENANT_MODE=payload")
+        claimed = claim_untagged_points(rag.client, rag.collection_name, tenant)
+        ensure_tenant_index(rag.client, rag.collection_name)
+        print(f"Assigned {claimed} untagged point(s) to tenant '{tenant}'")
+        return
+    
+    if args.suggest_only:
+        rag.generate_suggested_answers(max_workers=args.suggest_workers)
+        return
+    
+    converter = None
+    if args.source_directory:
+        # Convert raw questionnaires in parallel; unchanged files are skipped via the conversion cache
+        converter = QuestionnaireConverter(output_directory=qa_directory,
+                                           cache_directory=tenant_conversion_cache(settings, tenant),
+                                           max_workers=args.workers)
+        converted, unchanged = converter.convert_directory(args.source_directory)
+        # A blue/green rebuild replaces the whole collection, so it needs the unchanged
+        # documents too; an incremental run only writes the changed ones
+        question_answers = converted + unchanged if args.blue_green else converted
+    else:
+        # Get question answers from the specified directory
+        question_answers = rag.get_question_answers(qa_directory=qa_directory)
+    if not question_answers:
+        return
+    
+    documents = rag.load_data(text_list=question_answers, tenant_metadata=tenant_payload(settings, tenant))
+    nodes = rag.split_text_and_create_nodes(documents=documents)
+    
+    if not args.blue_green:
+        if not rag.write_to_vectordb(nodes=nodes):
+            raise SystemExit(1)
+        if converter:
+            converter.record_ingested(question_answers)
+        if args.suggest:
+            rag.generate_suggested_answers(max_workers=args.suggest_workers)
+        return
+    
+    # Build a shadow collection while the API keeps serving the current one
+    aliases = CollectionAliasManager(rag.client, alias=rag.collection_name)
+    if aliases.has_plain_collection() and not args.replace_collection:
+        raise SystemExit(f"{aliases.alias} is a plain collection, rerun with --replace_collection to migrate it to an alias")
+    
+    shadow = aliases.create_shadow_collection(vector_size=len(rag.get_semantic_vector("dimension probe")))
+    # Clusters and suggestions are carried over from the collection currently served
+    live_collection = aliases.current_version() or (aliases.alias if aliases.has_plain_collection() else None)
+    rag.use_collection(shadow)
+    if not rag.write_to_vectordb(nodes=nodes, payload_source=live_collection):
+        raise SystemExit(1)
+    if args.suggest:
+        rag.generate_suggested_answers(max_workers=args.suggest_workers, previous_collection=live_collection)
+    aliases.finish_bulk_load(shadow)
+    aliases.validate(shadow, expected_points=len(nodes))
     
-    # Get question answers from the specified directory
-    question_answers = rag.get_question_answers(qa_directory=args.qa_directory)
-    if question_answers:
-        documents = rag.load_data(text_list=question_answers)
-        nodes = rag.split_text_and_create_nodes(documents=documents)
-        rag.write_to_vectordb(nodes=nodes)
+    if args.replace_collection:
+        aliases.migrate_plain_collection()
+    aliases.switch_alias(shadow)
+    if converter:
+        converter.record_ingested(question_answers)
+    aliases.prune(keep=args.keep_versions)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,9 @@
+# tests/conftest.py
+import os
+import sys
+
+# The root scripts import the API package as `app.*`, while the API modules import each
+# other from inside app/ (`config`, `services.*`), so both directories go on the path.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "app"))
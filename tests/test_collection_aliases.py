@@ -0,0 +1,36 @@
+# tests/test_collection_aliases.py
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+from qdrant_client import models
+
+from collection_aliases import CollectionAliasManager
+
+def _load(client, collection_name, count):
+    client.upsert(collection_name, points=[
+        models.PointStruct(id=i, vector=[1.0, float(i), 0.0, 1.0], payload={"cluster_id": str(i)})
+        for i in range(count)
+    ])
+
+def test_local_blue_green_switches_alias():
+    client = qdrant_client.QdrantClient(":memory:")
+    manager = CollectionAliasManager(client, alias="qa", local_mode=True)
+
+    shadow = manager.create_shadow_collection(vector_size=4)
+    _load(client, shadow, 5)
+    # The embedded store never reports indexed vectors; this must not wait for them
+    manager.finish_bulk_load(shadow, timeout=5, poll_interval=0.1)
+    manager.validate(shadow, expected_points=5)
+    manager.switch_alias(shadow)
+
+    assert manager.current_version() == shadow
+    assert client.count("qa", exact=True).count == 5
+
+def test_validate_rejects_short_collection():
+    client = qdrant_client.QdrantClient(":memory:")
+    manager = CollectionAliasManager(client, alias="qa", local_mode=True)
+    shadow = manager.create_shadow_collection(vector_size=4)
+    _load(client, shadow, 3)
+
+    with pytest.raises(ValueError):
+        manager.validate(shadow, expected_points=4)
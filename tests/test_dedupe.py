@@ -0,0 +1,74 @@
+# tests/test_dedupe.py
+import json
+
+import numpy as np
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+from qdrant_client import models
+
+import dedupe
+from dedupe import NearDuplicateFinder
+
+@pytest.fixture
+def client(monkeypatch):
+    client = qdrant_client.QdrantClient(":memory:")
+    monkeypatch.setattr(dedupe, "create_qdrant_client", lambda settings: client)
+    return client
+
+def normalized(vectors: np.ndarray) -> np.ndarray:
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+def near_duplicates(rng, count: int, dim: int, noise: float) -> np.ndarray:
+    # Each base vector followed by a perturbed copy at cosine similarity around 1 - noise²/2
+    base = normalized(rng.standard_normal((count, dim)))
+    copies = normalized(base + noise * normalized(rng.standard_normal((count, dim))))
+    return np.concatenate([base, copies])
+
+def test_lsh_finds_planted_duplicates(client):
+    rng = np.random.default_rng(0)
+    vectors = near_duplicates(rng, count=300, dim=128, noise=0.25)
+    finder = NearDuplicateFinder()
+
+    clusters = finder.cluster(vectors)
+    cluster_of = {index: number for number, members in enumerate(clusters) for index in members}
+    found = sum(index in cluster_of and cluster_of.get(index + 300) == cluster_of[index] for index in range(300))
+    # Pairs sit at similarity ~0.97, where the default tables find almost every pair
+    assert found >= 0.97 * 300
+    # Unrelated random vectors are never merged
+    assert all(len(members) == 2 for members in clusters)
+
+def test_lsh_compares_only_likely_neighbours(client):
+    vectors = normalized(np.random.default_rng(1).standard_normal((2000, 128)))
+    finder = NearDuplicateFinder()
+    compared = sum(len(bucket) * (len(bucket) - 1) // 2 for bucket in finder._lsh_buckets(vectors))
+    assert compared < 0.05 * 2000 * 1999 // 2
+    assert finder.cluster(vectors) == []
+
+def test_canonical_is_most_common_answer():
+    rows = [{"answer": "Yes"}, {"answer": "yes "}, {"answer": "Yes, always encrypted"}]
+    assert NearDuplicateFinder.pick_canonical([0, 1, 2], rows) in (0, 1)
+    assert NearDuplicateFinder.pick_canonical([0, 2], rows) == 2
+
+def test_mark_duplicates_writes_clusters(client):
+    finder = NearDuplicateFinder(threshold=0.9)
+    client.create_collection(finder.collection_name,
+                             vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    rows = [("Encrypted at rest?", "Yes", [1.0, 0.0]), ("Is data encrypted at rest?", "Yes", [0.99, 0.05]),
+            ("Do you support SSO?", "SAML", [0.0, 1.0])]
+    client.upsert(finder.collection_name, points=[
+        models.PointStruct(id=index, vector=vector,
+                           payload={"_node_content": json.dumps({"text": question}), "answer": answer})
+        for index, (question, answer, vector) in enumerate(rows)
+    ])
+
+    vectors, ids, report_rows = finder.fetch_vectors()
+    clusters = finder.cluster(vectors)
+    report = finder.build_report(clusters, ids, report_rows)
+    assert (report["clusters"], report["duplicate_points"], report["divergent_clusters"]) == (1, 1, 0)
+
+    finder.mark_duplicates(clusters, ids, report_rows)
+    payloads = {point.id: point.payload for point in client.retrieve(finder.collection_name, ids=[0, 1, 2])}
+    assert payloads[0]["cluster_id"] == payloads[1]["cluster_id"]
+    assert sorted([payloads[0]["is_duplicate"], payloads[1]["is_duplicate"]]) == [False, True]
+    assert (payloads[2]["cluster_id"], payloads[2]["is_duplicate"]) == ("2", False)
@@ -0,0 +1,12 @@
+# tests/test_endpoints.py
+from api import endpoints
+
+def test_evicted_tenants_drop_their_build_locks(monkeypatch):
+    monkeypatch.setattr(endpoints, "_services", endpoints.OrderedDict())
+    monkeypatch.setattr(endpoints, "_build_locks", {})
+    monkeypatch.setattr(endpoints.settings, "TENANT_CACHE_SIZE", 2)
+
+    for tenant in ("acme", "globex", "initech", "umbrella"):
+        assert endpoints._get_or_create_service("search", tenant, lambda tenant: f"{tenant}-service") == f"{tenant}-service"
+    assert list(endpoints._services) == ["initech", "umbrella"]
+    assert set(endpoints._build_locks) == {"initech", "umbrella"}
@@ -0,0 +1,80 @@
+# tests/test_ingest.py
+from concurrent.futures import ThreadPoolExecutor
+
+import ingest
+from ingest import QuestionnaireConverter, parse_markdown_tables, tables_to_rows, _match_columns, _split_row
+
+QUESTIONNAIRE = """
+| Vendor Security Review | Unnamed: 1 | Unnamed: 2 | Unnamed: 3 |
+| --- | --- | --- | --- |
+| Please answer every question | NaN | NaN | NaN |
+| Question ID | Question | Vendor Response | Product |
+| SEC-1 | Is data encrypted at rest? | Yes, AES-256 | Vault |
+| SEC-2 | Do you support SSO? | NaN | Vault |
+| SEC-3 | Which protocols \\| ciphers? | TLS 1.3 \\| AES-GCM | NaN |
+| SEC-4 | Any open findings? | none | Vault |
+| SEC-5 | Pen test vendor? | None | Vault |
+|  | Is MFA enforced? | Yes |  |
+"""
+
+def test_split_row_keeps_escaped_pipes():
+    assert _split_row(r"| a \| b | c |") == ["a | b", "c"]
+    assert _split_row("| | x |") == ["", "x"]
+
+def test_match_columns_prefers_exact_names():
+    assert _match_columns(["Question ID", "Question", "Vendor Response", "Product"]) == {
+        "question": 1, "answer": 2, "product": 3, "row_id": 0,
+    }
+
+def test_header_is_found_below_title_rows():
+    rows = tables_to_rows(parse_markdown_tables(QUESTIONNAIRE), "Default")
+    assert [row["row_id"] for row in rows] == ["SEC-1", "SEC-3", "SEC-4", "R004"]
+    assert rows[0] == {"row_id": "SEC-1", "question": "Is data encrypted at rest?",
+                       "answer": "Yes, AES-256", "product": "Vault"}
+
+def test_missing_answers_are_skipped():
+    rows = tables_to_rows(parse_markdown_tables(QUESTIONNAIRE), "Default")
+    answers = {row["row_id"]: row["answer"] for row in rows}
+    # NaN and None renderings are missing values; a written "none" is a real answer
+    assert "SEC-2" not in answers
+    assert "SEC-5" not in answers
+    assert answers["SEC-4"] == "none"
+
+def test_escaped_pipes_stay_in_one_cell():
+    rows = tables_to_rows(parse_markdown_tables(QUESTIONNAIRE), "Default")
+    sec3 = next(row for row in rows if row["row_id"] == "SEC-3")
+    assert sec3["question"] == "Which protocols | ciphers?"
+    assert sec3["answer"] == "TLS 1.3 | AES-GCM"
+    assert sec3["product"] == "Default"
+
+def test_tables_without_qa_columns_are_skipped():
+    markdown = "| Name | Value |\n| --- | --- |\n| a | b |\n"
+    assert tables_to_rows(parse_markdown_tables(markdown), "Default") == []
+
+def test_cache_is_written_only_after_ingestion(tmp_path, monkeypatch):
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "review.xlsx").write_bytes(b"xlsx")
+    (source / "review.csv").write_bytes(b"csv")
+    monkeypatch.setattr(ingest, "ProcessPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(ingest, "_to_markdown", lambda file_path: "| Question | Answer |\n| --- | --- |\n| q | a |\n")
+
+    def converter(product="Default"):
+        return QuestionnaireConverter(output_directory=str(tmp_path / "qa"), cache_directory=str(tmp_path / "cache"),
+                                      default_product=product)
+
+    first = converter()
+    converted, unchanged = first.convert_directory(str(source))
+    # Names keep the extension, so files sharing a stem stay separate documents
+    assert sorted(document["document_name"] for document in converted) == ["review.csv", "review.xlsx"]
+    assert unchanged == []
+
+    # Nothing was recorded, as if the vector store write had failed, so both are converted again
+    second = converter()
+    converted, unchanged = second.convert_directory(str(source))
+    assert len(converted) == 2
+    second.record_ingested(converted)
+
+    assert [len(result) for result in converter().convert_directory(str(source))] == [0, 2]
+    # Another default product changes the rows, so the cache is not reused
+    assert [len(result) for result in converter("Vault").convert_directory(str(source))] == [2, 0]
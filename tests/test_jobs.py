@@ -0,0 +1,91 @@
+# tests/test_jobs.py
+import threading
+
+import pytest
+
+from services.jobs import COMPLETED, RUNNING, JobHandler, JobQuotaExceeded, JobRunner, JobStore
+
+class UpperHandler(JobHandler):
+    def __init__(self, job_id, tenant, params):
+        self.processed = []
+
+    def process(self, item):
+        if item["text"] == "bad":
+            raise ValueError("bad row")
+        self.processed.append(item["text"])
+        return {"text": item["text"].upper()}
+
+    def finish(self):
+        return {"processed": len(self.processed)}
+
+@pytest.fixture
+def store(tmp_path):
+    return JobStore(str(tmp_path / "jobs.db"))
+
+def items(*texts):
+    return [{"text": text} for text in texts]
+
+def test_checkpoints_resume_from_the_first_pending_row(store):
+    job = store.create("upper", "acme", {}, items("a", "b", "c"))
+    assert store.claim_next() == job.id
+    store.checkpoint(job.id, 0, result={"text": "A"})
+    # A repeated checkpoint for the same row is ignored
+    store.checkpoint(job.id, 0, result={"text": "A"})
+    store.checkpoint(job.id, 1, error="boom")
+
+    info = store.get(job.id)
+    assert (info.completed, info.failed, info.status) == (1, 1, RUNNING)
+    assert store.pending_rows(job.id) == [(2, {"text": "c"})]
+
+    # A restart queues the interrupted job again with its checkpoints intact
+    assert store.requeue_interrupted() == 1
+    assert store.claim_next() == job.id
+    assert store.pending_rows(job.id) == [(2, {"text": "c"})]
+    assert [row.status for row in store.rows(job.id)] == ["completed", "failed", "pending"]
+
+def test_quota_is_enforced_per_tenant(store):
+    store.create("upper", "acme", {}, items("a"), max_active=2)
+    store.create("upper", "acme", {}, items("a"), max_active=2)
+    with pytest.raises(JobQuotaExceeded):
+        store.create("upper", "acme", {}, items("a"), max_active=2)
+    store.create("upper", "globex", {}, items("a"), max_active=2)
+    assert store.active_count("acme") == 2
+
+def test_concurrent_submissions_respect_the_quota(store):
+    accepted, rejected = [], []
+    barrier = threading.Barrier(8)
+
+    def submit():
+        barrier.wait()
+        try:
+            accepted.append(store.create("upper", "acme", {}, items("a"), max_active=3))
+        except JobQuotaExceeded:
+            rejected.append(True)
+
+    threads = [threading.Thread(target=submit) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (len(accepted), len(rejected)) == (3, 5)
+    assert store.active_count("acme") == 3
+
+def test_runner_processes_rows_and_stores_the_summary(store):
+    runner = JobRunner(store, {"upper": UpperHandler})
+    job = runner.submit("upper", "acme", {}, items("a", "bad", "c"))
+    assert store.claim_next() == job.id
+    runner._run(job.id)
+
+    info = store.get(job.id)
+    assert (info.status, info.completed, info.failed) == (COMPLETED, 2, 1)
+    assert info.summary == {"processed": 2}
+    assert [row.result for row in store.rows(job.id)] == [{"text": "A"}, None, {"text": "C"}]
+    with pytest.raises(ValueError):
+        runner.submit("unknown", "acme", {}, items("a"))
+
+def test_handlers_must_implement_process():
+    class Incomplete(JobHandler):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,66 @@
+# tests/test_qdrant_export.py
+import json
+
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+from qdrant_client import models
+
+from services.qdrant_export import QdrantExporter
+
+def stored_payload(question: str, answer: str, document_name: str) -> dict:
+    # The shape QdrantVectorStore writes, plus the keys added after ingestion
+    return {
+        "_node_content": json.dumps({"text": question}),
+        "_node_type": "TextNode",
+        "answer": answer,
+        "product": "Vault",
+        "document_name": document_name,
+        "doc_id": "doc",
+        "ref_doc_id": "doc",
+        "tenant_id": "acme",
+        "cluster_id": "c1",
+        "is_duplicate": False,
+        "suggested_answer": "Suggested",
+        "suggestion_hash": "abc",
+    }
+
+@pytest.fixture
+def exporter():
+    client = qdrant_client.QdrantClient(":memory:")
+    client.create_collection("qa", vectors_config=models.VectorParams(size=2, distance=models.Distance.COSINE))
+    client.upsert("qa", points=[
+        models.PointStruct(id=1, vector=[1.0, 0.0], payload=stored_payload("Encrypted?", "Yes", "a.xlsx")),
+        models.PointStruct(id=2, vector=[0.0, 1.0], payload=stored_payload("SSO?", "SAML", "b.pdf")),
+        models.PointStruct(id=3, vector=[1.0, 1.0], payload=stored_payload("MFA?", "Always", "a.xlsx")),
+    ])
+    return QdrantExporter(client=client, collection_name="qa")
+
+def test_rows_hold_only_qa_fields(exporter):
+    page = exporter.list_documents(limit=10)
+    assert [row.payload for row in page.rows][0] == {
+        "question": "Encrypted?", "answer": "Yes", "product": "Vault", "document_name": "a.xlsx",
+    }
+    assert page.next_cursor is None
+
+def test_pages_follow_the_cursor(exporter):
+    first = exporter.list_documents(limit=2)
+    second = exporter.list_documents(limit=2, cursor=first.next_cursor)
+    assert [row.node_id for row in first.rows + second.rows] == ["1", "2", "3"]
+    with pytest.raises(ValueError):
+        exporter.list_documents(cursor="not-a-point-id")
+
+def test_export_json_groups_rows_by_document(exporter, monkeypatch):
+    # Exporting only reads: indexes are created at ingestion, not by a GET
+    def create_payload_index(*args, **kwargs):
+        raise AssertionError("export must not create indexes")
+    monkeypatch.setattr(exporter.client, "create_payload_index", create_payload_index)
+
+    exported = json.loads("".join(exporter.export_json()))
+    assert exported == [
+        {"document_name": "a.xlsx", "data": [
+            {"question": "Encrypted?", "answer": "Yes", "product": "Vault"},
+            {"question": "MFA?", "answer": "Always", "product": "Vault"},
+        ]},
+        {"document_name": "b.pdf", "data": [{"question": "SSO?", "answer": "SAML", "product": "Vault"}]},
+    ]
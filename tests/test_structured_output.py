@@ -0,0 +1,30 @@
+# tests/test_structured_output.py
+import pytest
+
+from services.structured_output import ParseStats, extract_suggested_answer
+
+def test_extracts_answer_around_noise():
+    text = 'Sure!\n```json\n{"suggested_answer": "Yes, \\"AES-256\\"\\nat rest"}\n```'
+    assert extract_suggested_answer(text) == 'Yes, "AES-256"\nat rest'
+
+def test_missing_field_is_none():
+    assert extract_suggested_answer("Empty Response") is None
+    assert extract_suggested_answer(None) is None
+
+@pytest.mark.parametrize("text", ['{"suggested_answer": "Yes, data is encrypted wi',
+                                  '{"suggested_answer": "Cut after an escape \\'])
+def test_truncated_answer_is_rejected(text):
+    assert extract_suggested_answer(text) is None
+
+def test_invalid_escape_keeps_text():
+    assert extract_suggested_answer('{"suggested_answer": "C:\\x41"}') == "C:\\x41"
+
+def test_parse_stats_snapshot():
+    stats = ParseStats()
+    stats.record("structured")
+    stats.record("failed")
+    stats.record_retry()
+    snapshot = stats.snapshot()
+    assert snapshot["total"] == 2
+    assert snapshot["llm_calls"] == 3
+    assert snapshot["failure_rate"] == 0.5
@@ -0,0 +1,50 @@
+# tests/test_suggested_answers.py
+import pytest
+
+qdrant_client = pytest.importorskip("qdrant_client")
+from llama_index.core import ChatPromptTemplate
+from llama_index.core.llms import ChatMessage, MockLLM
+from llama_index.core.schema import TextNode
+
+from services.structured_output import SuggestedAnswer
+from services.suggested_answers import SuggestedAnswerGenerator
+
+class FakeSynthesizer:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def synthesize(self, query_bundle, nodes):
+        self.calls += 1
+        if isinstance(self.result, Exception):
+            raise self.result
+        return type("Response", (), {"response": self.result})()
+
+def make_generator(structured, text) -> SuggestedAnswerGenerator:
+    prompt = ChatPromptTemplate([ChatMessage(role="user", content="{context_str} {query_str}")])
+    generator = SuggestedAnswerGenerator(qdrant_client.QdrantClient(":memory:"), "qa", MockLLM(), "model", prompt)
+    generator.synthesizer = FakeSynthesizer(structured)
+    generator.text_synthesizer = FakeSynthesizer(text)
+    return generator
+
+def test_structured_answer():
+    generator = make_generator(SuggestedAnswer(suggested_answer="Improved"), None)
+    assert generator._generate(TextNode(text="q")) == "Improved"
+    assert generator.parse_stats.snapshot()["structured"] == 1
+
+def test_parse_error_is_retried_as_free_text():
+    generator = make_generator(ValueError("no tool call"), '{"suggested_answer": "Recovered"}')
+    assert generator._generate(TextNode(text="q")) == "Recovered"
+    snapshot = generator.parse_stats.snapshot()
+    assert (snapshot["fallback"], snapshot["retries"]) == (1, 1)
+
+def test_other_errors_are_not_retried():
+    generator = make_generator(ConnectionError("down"), '{"suggested_answer": "Unused"}')
+    assert generator._generate(TextNode(text="q")) is None
+    assert generator.text_synthesizer.calls == 0
+    assert generator.parse_stats.snapshot()["llm_calls"] == 0
+
+def test_truncated_fallback_counts_as_failed():
+    generator = make_generator(ValueError("no tool call"), '{"suggested_answer": "Cut o')
+    assert generator._generate(TextNode(text="q")) is None
+    assert generator.parse_stats.snapshot()["failed"] == 1
@@ -0,0 +1,66 @@
+# tests/test_tenancy.py
+import pytest
+from pydantic import ValidationError
+
+pytest.importorskip("qdrant_client")
+
+from app.config import Settings
+from app.services import tenancy
+from app.services.tenancy import (
+    TenantRateLimiter,
+    resolve_tenant,
+    tenant_collection,
+    tenant_conversion_cache,
+    tenant_qa_directory,
+)
+
+def make_settings(**overrides) -> Settings:
+    return Settings(_env_file=None, **overrides)
+
+def test_tenant_keys_are_normalized():
+    settings = make_settings(TENANTS={" Acme ": {"company_name": "Acme"}})
+    assert settings.TENANTS == {"acme": {"company_name": "Acme"}}
+    assert resolve_tenant(settings, "ACME") == "acme"
+
+@pytest.mark.parametrize("tenants", [{"acme_v1": {}}, {"v2": {}}, {"Acme Corp": {}}, {"acme": {}, "ACME": {}}])
+def test_invalid_tenant_keys_fail_at_startup(tenants):
+    with pytest.raises(ValidationError):
+        make_settings(TENANTS=tenants)
+
+def test_resolve_tenant():
+    settings = make_settings(TENANTS={"acme": {}})
+    assert resolve_tenant(settings, None) == "default"
+    for tenant in ("acme_v20260101", "v1", "../etc"):
+        with pytest.raises(ValueError):
+            resolve_tenant(settings, tenant)
+    with pytest.raises(ValueError, match="Unknown tenant"):
+        resolve_tenant(settings, "globex")
+
+def test_tenant_locations():
+    settings = make_settings(TENANTS={"acme": {}}, QDRANT_VECTOR_COLLECTION="qa",
+                             QA_DIRECTORY_PATH="/qa", CONVERSION_CACHE_PATH="/cache")
+    assert tenant_collection(settings, "default") == "qa"
+    assert tenant_collection(settings, "acme") == "qa_acme"
+    assert tenant_qa_directory(settings, "acme") == "/qa/acme"
+    assert tenant_conversion_cache(settings, "default") == "/cache"
+    assert tenant_conversion_cache(settings, "acme") == "/cache/acme"
+
+    payload_settings = make_settings(TENANT_MODE="payload", QDRANT_VECTOR_COLLECTION="qa", TENANTS={"acme": {}})
+    assert tenant_collection(payload_settings, "acme") == "qa"
+
+def test_rate_limiter_refills(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(tenancy.time, "monotonic", lambda: now[0])
+    limiter = TenantRateLimiter(make_settings(TENANTS={"acme": {"rate_limit_per_minute": 2}}))
+
+    assert limiter.allow("acme")
+    assert limiter.allow("acme")
+    assert not limiter.allow("acme")
+    # One token refills every 30 seconds at 2 per minute
+    now[0] += 30
+    assert limiter.allow("acme")
+    assert not limiter.allow("acme")
+
+def test_rate_limiter_disabled_by_default():
+    limiter = TenantRateLimiter(make_settings())
+    assert all(limiter.allow("default") for _ in range(1000))